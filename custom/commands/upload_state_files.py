@@ -1,13 +1,10 @@
-import json
 import logging
 
 import boto3
 import click
 
-from benedict import benedict
 from botocore.exceptions import ClientError
-from pathlib import Path
-from spacemk import get_tmp_folder, get_tmp_subfolder
+from spacemk import get_tmp_subfolder, load_normalized_data
 from slugify import slugify
 
 
@@ -51,10 +48,7 @@ def _list_state_files(data: dict) -> list[dict]:
 
 
 def _load_data_from_file() -> dict:
-    path = Path(get_tmp_folder(), "data.json")
-
-    with path.open("r", encoding="utf-8") as fp:
-        return benedict(json.load(fp))
+    return load_normalized_data(entity_types=["stacks"])
 
 
 def _upload_file(bucket: str, file_path: str, object_name: str) -> None:
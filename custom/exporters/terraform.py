@@ -6,23 +6,6 @@ from spacemk.exporters.terraform import TerraformExporter as BaseTerraformExport
 
 
 class TerraformExporter(BaseTerraformExporter):
-    def _create_agent_pool(self, organization_id: str) -> str:
-        agent_pools_data = self._extract_data_from_api(
-            path=f"/organizations/{organization_id}/agent-pools",
-            properties=["attributes.name", "id"],
-        )
-
-        for agent_pool_data in agent_pools_data:
-            if agent_pool_data.get("attributes.name") == "SMK":
-                logging.info(f"Reusing existing '{agent_pool_data.get('id')}' agent pool")
-
-                return agent_pool_data.get("id")
-
-        logging.error(f"Could not find an agent pool name 'SMK' for organization '{organization_id}'")
-
-    def _delete_agent_pool(self, id_: str) -> None:
-        logging.info(f"Keep existing '{id_}' agent pool")
-
     def _drop_aws_access_keys(self, data: dict) -> dict:
         purged_workspace_variables = []
 
@@ -49,7 +32,10 @@ class TerraformExporter(BaseTerraformExporter):
 
         return data
 
-    def _start_agent_container(self, agent_pool_id: str, container_name: str) -> Container:
+    def _start_agent_container(
+        self, agent_pool_id: str, container_name: str, variable_names: list[str] | None = None  # noqa: ARG002
+    ) -> Container:
+        # Existing containers print their whole environment, as they were started without the variable names
         if docker.container.exists(container_name):
             logging.info(f"Found a container named '{container_name}'. Using it instead of starting a new one.")
             container = docker.container.inspect(container_name)
@@ -1,11 +1,37 @@
+import contextlib
 import json
 import logging
 import subprocess
+import threading
+from collections.abc import Iterator
 from pathlib import Path
 from shutil import which
+from typing import IO
 
 from benedict import benedict
 
+from spacemk.entity_index import EntityIndex
+from spacemk.storage import JsonLinesStorage
+
+# Normalized data loaded by the process, by entity type, the entity types they are related to, the data returned by
+# previous calls, by requested entity types, and the state of the files it was all loaded from
+_normalized_data_cache = {"entities": {}, "related_entity_types": {}, "results": {}, "signature": None}
+
+
+def _list_related_entity_types(entities: list[dict]) -> set[str]:
+    entity_types = set()
+    for entity in entities:
+        relationships = entity.get("_relationships") if isinstance(entity, dict) else None
+        if not relationships:
+            continue
+
+        for type_, value in relationships.items():
+            # Only normalized relationships refer to entities that need to be loaded
+            if isinstance(value, str):
+                entity_types.add(f"{type_}s")
+
+    return entity_types
+
 
 def ensure_folder_exists(path: Path | str) -> None:
     if isinstance(path, str):
@@ -13,11 +39,40 @@ def ensure_folder_exists(path: Path | str) -> None:
 
     if not path.exists():
         logging.debug(f"Creating the '{path}' folder")
-        path.mkdir(parents=True)
+        # The folder might be created by another thread in the meantime
+        path.mkdir(exist_ok=True, parents=True)
     else:
         logging.debug(f"The '{path}' folder already exists. Skipping creation.")
 
 
+@contextlib.contextmanager
+def open_atomically(path: Path, mode: str = "w") -> Iterator[IO]:
+    """Open a file for writing, so that it is only replaced once it is completely written
+
+    The content is written to a temporary file next to the file, and moved over it once the block exits without error.
+    An interruption never leaves a truncated file behind, and the temporary file is removed on error.
+
+    Args:
+        path (Path): Path of the file
+        mode (str, optional): Mode the temporary file is opened with, either "w" or "wb". Defaults to "w".
+
+    Yields:
+        IO: Temporary file object
+    """
+    # Named after the thread, so that concurrent writers do not share it
+    partial_path = path.with_name(f"{path.name}.{threading.get_ident()}.part")
+    encoding = None if "b" in mode else "utf-8"
+
+    try:
+        with partial_path.open(mode, encoding=encoding) as fp:
+            yield fp
+
+        partial_path.replace(path)
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+
+
 def get_tmp_folder() -> Path:
     current_file = Path(__file__).parent.resolve()
     tmp_folder = Path(current_file, "../tmp").resolve()
@@ -45,13 +100,136 @@ def is_command_available(command: str | list[str], execute: bool = False) -> boo
     return which(command) is not None
 
 
-def load_normalized_data() -> dict:
-    path = Path(get_tmp_folder(), "data.json")
-    with path.open("r", encoding="utf-8") as fp:
-        return benedict(json.load(fp))
+def load_normalized_data(entity_types: list[str] | None = None) -> dict:
+    """Load the normalized data saved by the export command
+
+    The data is read from the JSON Lines files in tmp/data, unless tmp/data.json was modified after they were saved
+    (e.g. when it was edited by hand after the export). Loaded data is cached by the process until these files are
+    modified, and the same data is returned to every call for the same entity types, so it should not be modified by
+    callers.
+
+    Args:
+        entity_types (list[str], optional): Only load these entity types (e.g. ["stacks"]), and the entity types they
+            have normalized relationships to. Defaults to None, meaning all entity types.
+
+    Returns:
+        dict: Normalized data
+    """
+    storage = JsonLinesStorage(get_tmp_subfolder("data"))
+    pretty_path = Path(get_tmp_folder(), "data.json")
+    pretty_stat = pretty_path.stat() if pretty_path.exists() else None
+
+    signature = (storage.get_signature(), pretty_stat and (pretty_stat.st_mtime_ns, pretty_stat.st_size))
+    if signature != _normalized_data_cache["signature"]:
+        _normalized_data_cache["entities"] = {}
+        _normalized_data_cache["related_entity_types"] = {}
+        _normalized_data_cache["results"] = {}
+        _normalized_data_cache["signature"] = signature
+
+    results = _normalized_data_cache["results"]
+    result_key = None if entity_types is None else tuple(sorted(set(entity_types)))
+    if result_key in results:
+        return results[result_key]
+
+    cached_entities = _normalized_data_cache["entities"]
+    related_entity_types = _normalized_data_cache["related_entity_types"]
+
+    storage_mtime = storage.get_mtime()
+    if storage_mtime is None or (pretty_stat and pretty_stat.st_mtime > storage_mtime):
+        if not cached_entities:
+            with pretty_path.open("r", encoding="utf-8") as fp:
+                cached_entities.update(json.load(fp))
+
+        load = cached_entities.get
+
+        if entity_types is None:
+            entity_types = list(cached_entities)
+    else:
+
+        def load(entity_type: str) -> list[dict] | None:
+            if entity_type not in cached_entities:
+                cached_entities[entity_type] = storage.load(entity_type)
+
+            return cached_entities[entity_type]
+
+        if entity_types is None:
+            entity_types = storage.get_entity_types()
+
+    data = {}
+    pending_entity_types = list(entity_types)
+    while pending_entity_types:
+        entity_type = pending_entity_types.pop()
+        if entity_type in data:
+            continue
+
+        entities = load(entity_type)
+        if entities is None:
+            continue
+
+        data[entity_type] = entities
+        # Listed before the relationships are resolved, as cached entities are resolved in place
+        if entity_type not in related_entity_types:
+            related_entity_types[entity_type] = _list_related_entity_types(entities)
+        pending_entity_types.extend(related_entity_types[entity_type])
+
+    results[result_key] = benedict(resolve_relationships(data))
+
+    return results[result_key]
+
+
+def resolve_relationships(data: dict) -> dict:
+    """Replace related entity IDs by the related entities
+
+    Relationships exported in normalized form only hold the source ID of the related entity (e.g.
+    `{"_relationships": {"space": "org-123"}}`). They are replaced in place by a reference to the entity with that
+    `_source_id` in the matching entity type (e.g. `spaces`), so that `stack._relationships.space._migration_id` works
+    the same as with expanded relationships. Expanded relationships are left untouched.
+
+    Args:
+        data (dict): Normalized data
+
+    Returns:
+        dict: Normalized data with resolved relationships
+    """
+    indexes = {}
+    for entities in data.values():
+        if not isinstance(entities, list):
+            continue
+
+        for entity in entities:
+            relationships = entity.get("_relationships") if isinstance(entity, dict) else None
+            if not relationships:
+                continue
+
+            for type_, value in relationships.items():
+                if not isinstance(value, str):
+                    continue
+
+                # Pluralize the type
+                if type_ not in indexes:
+                    indexes[type_] = EntityIndex(data.get(f"{type_}s", []))
+
+                related_entity = indexes[type_].find(value, key="_source_id")
+                if related_entity is None:
+                    logging.warning(f"Could not find related {type_} '{value}'")
+
+                relationships[type_] = related_entity
+
+    return data
+
+
+def save_normalized_data(data: dict, pretty: bool = True) -> None:
+    """Save normalized data as JSON Lines files in tmp/data
 
+    Args:
+        data (dict): Normalized data
+        pretty (bool, optional): Also save all the data in tmp/data.json, pretty-printed for human review. Defaults to
+            True.
+    """
+    pretty_path = Path(get_tmp_folder(), "data.json")
+    if pretty:
+        with pretty_path.open("w", encoding="utf-8") as fp:
+            json.dump(data, fp, indent=2, sort_keys=True)
 
-def save_normalized_data(data: dict) -> None:
-    path = Path(get_tmp_folder(), "data.json")
-    with path.open("w", encoding="utf-8") as fp:
-        json.dump(data, fp, indent=2, sort_keys=True)
+    # Saved after the pretty copy, so that the copy is only considered newer if it is modified afterwards
+    JsonLinesStorage(get_tmp_subfolder("data")).save(data)
@@ -10,6 +10,8 @@ from envyaml import EnvYAML
 from icecream import ic
 from rich.logging import RichHandler
 
+from spacemk.transport import DEFAULT_TRACE_MAX_BODY_SIZE, configure_tracing
+
 ic.configureOutput(includeContext=True, contextAbsPath=True)
 debug_enabled = False
 
@@ -21,9 +23,22 @@ debug_enabled = False
     help="Path to the configuration file.",
     type=click.Path(),
 )
+@click.option(
+    "--http-trace-file",
+    default=None,
+    help="Path to a file where HTTP requests and responses are traced, whatever the verbosity.",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--http-trace-max-body-size",
+    default=DEFAULT_TRACE_MAX_BODY_SIZE,
+    help="Maximum number of bytes of each HTTP request and response body included in traces.",
+    show_default=True,
+    type=int,
+)
 @click.option("-v", "--verbose", "verbosity", count=True, default=0, help="Level of verbosity for the output.")
 @click.pass_context
-def spacemk(ctx, config, verbosity):
+def spacemk(ctx, config, http_trace_file, http_trace_max_body_size, verbosity):
     load_dotenv()
 
     debug_verbosity = 2
@@ -48,6 +63,7 @@ def spacemk(ctx, config, verbosity):
         ],
         level=verbosity_to_level[verbosity],
     )
+    configure_tracing(file_path=http_trace_file, max_body_size=http_trace_max_body_size)
 
     ctx.meta["config"] = benedict(EnvYAML(config, flatten=False, include_environment=True))
 
@@ -5,7 +5,12 @@ from spacemk.exporters import load_exporter
 
 
 @click.command(help="Audit the source vendor setup.")
+@click.option("--offline", default=False, help="Only use cached source vendor API responses.", is_flag=True)
+@click.option("--then-export", default=False, help="Export the audited data without extracting it again.", is_flag=True)
 @pass_meta_key("config")
-def audit(config):
+def audit(config, offline, then_export):
+    if offline:
+        config["exporter.settings.offline"] = True
+
     exporter = load_exporter(config=config.get("exporter", {}))
-    exporter.audit()
+    exporter.audit(then_export=then_export)
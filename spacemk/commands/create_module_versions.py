@@ -2,10 +2,10 @@ import logging
 
 import click
 import requests
-from requests_toolbelt.utils import dump as request_dump
 
 from spacemk import load_normalized_data
 from spacemk.spacelift import Spacelift
+from spacemk.transport import trace_response
 
 
 def _get_repository_tags(endpoint: str, github_api_token: str, namespace: str, repository: str) -> dict:
@@ -19,7 +19,7 @@ def _get_repository_tags(endpoint: str, github_api_token: str, namespace: str, r
     try:
         url = f"{endpoint}/repos/{namespace}/{repository}/tags?per_page=100"
         response = requests.get(headers=headers, url=url)
-        logging.debug(request_dump.dump_all(response).decode("utf-8"))
+        trace_response(response)
         response.raise_for_status()
     except requests.exceptions.HTTPError as e:
         raise RuntimeError(f"HTTP Error: {e}") from e
@@ -34,7 +34,7 @@ def _get_repository_tags(endpoint: str, github_api_token: str, namespace: str, r
 @click.command(help="Create module versions.")
 @click.decorators.pass_meta_key("config")
 def create_module_versions(config):
-    data = load_normalized_data()
+    data = load_normalized_data(entity_types=["modules"])
 
     if "modules" not in data:
         logging.warning("No modules found. Skipping.")
@@ -1,3 +1,5 @@
+from pathlib import Path
+
 import click
 from click.decorators import pass_meta_key
 
@@ -5,7 +7,19 @@ from spacemk.exporters import load_exporter
 
 
 @click.command(help="Export information from the source vendor.")
+@click.option(
+    "--from-extraction",
+    "extraction_path",
+    default=None,
+    help="Use the data extracted by a previous audit or export (e.g. tmp/raw.json) instead of extracting it again.",
+    type=click.Path(dir_okay=False, exists=True, path_type=Path),
+)
+@click.option("--offline", default=False, help="Only use cached source vendor API responses.", is_flag=True)
+@click.option("--resume", default=False, help="Resume the previous export where it stopped.", is_flag=True)
 @pass_meta_key("config")
-def export(config):
+def export(config, extraction_path, offline, resume):
+    if offline:
+        config["exporter.settings.offline"] = True
+
     exporter = load_exporter(config=config.get("exporter", {}))
-    exporter.export()
+    exporter.export(extraction_path=extraction_path, resume=resume)
@@ -0,0 +1,63 @@
+import threading
+
+
+class EntityIndex:
+    """Lookup tables over a list of entities
+
+    Each table maps the values of a property (e.g. "id", "_source_id" or a foreign key such as
+    "relationships.workspace.data.id") to the entities having that value. Tables are built on first use, with a single
+    pass over the entities, and reused afterwards. The index must be rebuilt if entities are added or removed.
+    """
+
+    def __init__(self, entities: list[dict]):
+        """Constructor
+
+        Args:
+            entities (list[dict]): Entities to index
+        """
+        self._entities = entities
+        self._lock = threading.Lock()
+        self._tables = {}
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def _get_table(self, key: str) -> dict:
+        table = self._tables.get(key)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(key)
+                if table is None:
+                    table = {}
+                    for entity in self._entities:
+                        table.setdefault(entity.get(key), []).append(entity)
+
+                    self._tables[key] = table
+
+        return table
+
+    def find_all(self, value: str, key: str) -> list[dict]:
+        """List the entities having a given property value
+
+        Args:
+            value (str): Property value
+            key (str): Property keypath
+
+        Returns:
+            list[dict]: Matching entities, in their original order
+        """
+        return self._get_table(key).get(value, [])
+
+    def find(self, value: str, key: str = "id") -> dict | None:
+        """Find the first entity having a given property value
+
+        Args:
+            value (str): Property value
+            key (str, optional): Property keypath. Defaults to "id".
+
+        Returns:
+            dict | None: Matching entity, or None if there is none
+        """
+        entities = self._get_table(key).get(value)
+
+        return entities[0] if entities else None
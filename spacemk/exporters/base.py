@@ -1,4 +1,6 @@
+import json
 import logging
+import shutil
 from abc import ABC, abstractmethod
 from functools import reduce
 from pathlib import Path
@@ -6,7 +8,9 @@ from pathlib import Path
 import click
 import xlsxwriter
 
-from spacemk import get_tmp_folder, save_normalized_data
+from spacemk import get_tmp_folder, get_tmp_subfolder, open_atomically, save_normalized_data
+from spacemk.journal import Journal
+from spacemk.record import Record, flatten
 
 
 class BaseExporter(ABC):
@@ -17,6 +21,9 @@ class BaseExporter(ABC):
             config (dict): Exporter configuration
         """
         self._config = config
+        self._journals = {}
+        # Progress is only journaled to disk when exporting, as audits cannot be resumed
+        self._persist_journals = False
 
     def _check_data(self, data: dict) -> dict:
         """Check source provider data and add warnings as needed
@@ -38,6 +45,11 @@ class BaseExporter(ABC):
         """
         logging.info("No requirement checks defined. Skipping.")
 
+    def _clear_checkpoints(self) -> None:
+        """Remove the checkpoints and journals of the previous export"""
+        shutil.rmtree(get_tmp_subfolder("checkpoints"))
+        self._journals = {}
+
     def _display_report(self, data: dict) -> None:
         """Display data report in the terminal
 
@@ -79,6 +91,17 @@ class BaseExporter(ABC):
         """
         pass
 
+    def _extract_and_save_data(self) -> dict:
+        """Extract raw data from the source provider, and save it for later exports
+
+        Returns:
+            dict: Dictionary with entity types as the keys and lists of entities as the values
+        """
+        data = self._extract_data()
+        self._save_extraction(data)
+
+        return data
+
     def _filter_data(self, data: dict) -> dict:
         """Remove unwanted entities from source provider data
 
@@ -92,6 +115,81 @@ class BaseExporter(ABC):
 
         return data
 
+    def _get_extracted_data(self, path: Path | None = None) -> dict:
+        """Extract raw data from the source provider, or load data extracted previously
+
+        Args:
+            path (Path, optional): Path of raw data extracted by a previous audit or export. Defaults to None.
+
+        Returns:
+            dict: Dictionary with entity types as the keys and lists of entities as the values
+        """
+        if path is None:
+            return self._extract_and_save_data()
+
+        logging.info(f"Loading data extracted previously from '{path}'")
+        data = self._load_extraction(path)
+        if data is None:
+            raise FileNotFoundError(f"Could not find extracted data file '{path}'")
+
+        return data
+
+    def _get_journal(self, name: str) -> Journal:
+        """Get the progress journal of a long running stage
+
+        Args:
+            name (str): Journal name
+
+        Returns:
+            Journal: Journal, with the entries recorded by the previous export if it is resumed
+        """
+        if name not in self._journals:
+            path = Path(get_tmp_subfolder("checkpoints"), f"{name}.jsonl") if self._persist_journals else None
+            # The journal might be requested by several threads at once, but only one instance is kept
+            self._journals.setdefault(name, Journal(path))
+
+        return self._journals[name]
+
+    def _load_checkpoint(self, stage: str) -> dict | None:
+        """Load the data saved at the end of a stage
+
+        Args:
+            stage (str): Stage name
+
+        Returns:
+            dict | None: Source provider data, or None if there is no checkpoint for the stage
+        """
+        return self._load_data_file(Path(get_tmp_subfolder("checkpoints"), f"{stage}.json"))
+
+    def _load_data_file(self, path: Path) -> dict | None:
+        """Load source provider data from file
+
+        Args:
+            path (Path): Path of the file
+
+        Returns:
+            dict | None: Source provider data, or None if the file does not exist
+        """
+        if not path.exists():
+            return None
+
+        with path.open("r", encoding="utf-8") as fp:
+            return Record.from_data(json.load(fp))
+
+    def _get_extraction_path(self) -> Path:
+        return Path(get_tmp_folder(), "raw.json")
+
+    def _load_extraction(self, path: Path | None = None) -> dict | None:
+        """Load raw extracted data
+
+        Args:
+            path (Path, optional): Path of the file. Defaults to the data extracted by the previous audit or export.
+
+        Returns:
+            dict | None: Source provider data, or None if no data was extracted yet
+        """
+        return self._load_data_file(path or self._get_extraction_path())
+
     @abstractmethod
     def _map_data(self, data: dict) -> dict:
         """Map data from the source provider entity types to Spacelift equivalent entity types
@@ -112,6 +210,34 @@ class BaseExporter(ABC):
         """
         click.echo(message)
 
+    def _save_checkpoint(self, stage: str, data: dict) -> None:
+        """Save the data at the end of a stage
+
+        Args:
+            stage (str): Stage name
+            data (dict): Source provider data
+        """
+        self._save_data_file(Path(get_tmp_subfolder("checkpoints"), f"{stage}.json"), data)
+        logging.debug(f"Saved '{stage}' checkpoint")
+
+    def _save_data_file(self, path: Path, data: dict) -> None:
+        """Save source provider data to file
+
+        Args:
+            path (Path): Path of the file
+            data (dict): Source provider data
+        """
+        with open_atomically(path) as fp:
+            json.dump(data, fp)
+
+    def _save_extraction(self, data: dict) -> None:
+        """Save the raw extracted data, so that it can be reused by later audits and exports
+
+        Args:
+            data (dict): Source provider data
+        """
+        self._save_data_file(self._get_extraction_path(), data)
+
     def _save_report_to_file(self, data: dict) -> None:
         """Save source provider data report to file
 
@@ -127,10 +253,7 @@ class BaseExporter(ABC):
             worksheet_name = entity_type_name.replace("_", " ").title()
             worksheet = workbook.add_worksheet(name=worksheet_name)
 
-            flatten_entity_type_data = []
-            for entity_data in data.get(entity_type_name):
-                entity_data.keypath_separator = None
-                flatten_entity_type_data.append(entity_data.flatten(separator="."))
+            flatten_entity_type_data = [flatten(entity_data) for entity_data in data.get(entity_type_name)]
 
             if len(flatten_entity_type_data) > 0:
                 pivoted_entity_type_data = {
@@ -148,15 +271,18 @@ class BaseExporter(ABC):
 
         logging.info("Stop saving default report to file")
 
-    def audit(self) -> None:
+    def audit(self, then_export: bool = False) -> None:
         """Audit the source provider data
 
         A report is displayed in the terminal, and optionally, the extracted data can be saved to file.
+
+        Args:
+            then_export (bool, optional): Export the data afterwards, reusing the audit extraction. Defaults to False.
         """
         logging.info("Start auditing data")
 
         self._check_requirements(action="audit")
-        data = self._extract_data()
+        data = self._extract_and_save_data()
         data = self._filter_data(data)
         data = self._check_data(data)
         self._save_report_to_file(data)
@@ -164,15 +290,49 @@ class BaseExporter(ABC):
 
         logging.info("Stop auditing data")
 
-    def export(self) -> None:
-        """Export data from the source provider and map it to Spacelift entitty types"""
+        if then_export:
+            self.export(extraction_path=self._get_extraction_path())
+
+    def export(self, resume: bool = False, extraction_path: Path | None = None) -> None:
+        """Export data from the source provider and map it to Spacelift entitty types
+
+        The data is saved to a checkpoint after each stage, and long running stages journal their progress, so that
+        an interrupted export can be resumed.
+
+        Args:
+            resume (bool, optional): Resume the previous export where it stopped. Defaults to False.
+            extraction_path (Path, optional): Path of raw data extracted by a previous audit or export, used instead of
+                extracting the data again. Defaults to None.
+        """
         logging.info("Start exporting data")
 
         self._check_requirements(action="export")
-        data = self._extract_data()
-        data = self._filter_data(data)
-        data = self._enrich_data(data)
+
+        self._journals = {}
+        self._persist_journals = True
+        if not resume:
+            self._clear_checkpoints()
+
+        stages = [
+            ("extract", lambda _: self._get_extracted_data(extraction_path)),
+            ("filter", self._filter_data),
+            ("enrich", self._enrich_data),
+        ]
+
+        data = None
+        if resume:
+            for index in reversed(range(len(stages))):
+                data = self._load_checkpoint(stages[index][0])
+                if data is not None:
+                    logging.info(f"Resuming the export after the '{stages[index][0]}' stage")
+                    stages = stages[index + 1 :]
+                    break
+
+        for stage, function in stages:
+            data = function(data)
+            self._save_checkpoint(stage, data)
+
         data = self._map_data(data)
-        save_normalized_data(data)
+        save_normalized_data(data, pretty=self._config.get("pretty_data", True))
 
         logging.info("Stop exporting data")
@@ -1,21 +1,37 @@
 # ruff: noqa: PERF401
+import hashlib
 import json
 import logging
 import re
+import threading
 import time
+import urllib.parse
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 from pathlib import Path
 
 import click
 import pydash
 import requests
-from benedict import benedict
 from python_on_whales import Container, docker
-from requests_toolbelt.utils import dump as request_dump
 from slugify import slugify
 
-from spacemk import get_tmp_subfolder, is_command_available
+from spacemk import get_tmp_folder, get_tmp_subfolder, is_command_available, open_atomically
+from spacemk.entity_index import EntityIndex
 from spacemk.exporters import BaseExporter
+from spacemk.plan_log import iter_lines, parse_env_vars
+from spacemk.record import Record, compile_projection
+from spacemk.response_cache import ResponseCache
+from spacemk.transport import DEFAULT_POOL_SIZE, Transport
+
+AGENT_POOL_NAME = "SMK"
+API_PAGE_SIZE = 100  # Maximum page size allowed by the API
+ENV_VAR_NAME_PATTERN = re.compile("^[a-zA-Z_]+[a-zA-Z0-9_]*$")
+PLAN_COMPLETED_STATUSES = ["errored", "finished"]
+PLAN_FINAL_STATUSES = ["canceled", "errored", "finished", "unreachable"]
+PLAN_QUEUED_STATUSES = ["managed_queued", "pending", "queued"]
+PLAN_STATUS_TIMEOUTS = {"managed_queued": 600, "pending": 600, "queued": 600}
 
 
 class TerraformExporter(BaseExporter):
@@ -29,6 +45,62 @@ class TerraformExporter(BaseExporter):
                 "id": "properties.id",
             }
         }
+        self._agent_image_pulled = False
+        self._created_agent_pool_ids = set()
+        self._entity_indexes = {}
+        self._previous_extraction = None
+        self._query_params_supported = True
+        self._transport = None
+
+    def audit(self, *args, **kwargs) -> None:
+        try:
+            super().audit(*args, **kwargs)
+        finally:
+            if self._transport:
+                self._transport.log_retry_stats()
+
+    def export(self, *args, **kwargs) -> None:
+        try:
+            super().export(*args, **kwargs)
+        finally:
+            if self._transport:
+                self._transport.log_retry_stats()
+
+    def _add_query_params(self, url: str, params: dict) -> str:
+        if not params:
+            return url
+
+        # Parameters already in the URL (e.g. in pagination links) take precedence
+        parts = urllib.parse.urlsplit(url)
+        query = {**params, **dict(urllib.parse.parse_qsl(parts.query, keep_blank_values=True))}
+
+        return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query, safe="[],")))
+
+    def _build_query_params(self, resource_type: str | None, properties: list | None) -> dict:
+        """Build the query parameters used to reduce the number and size of API responses
+
+        Args:
+            resource_type (str | None): JSON:API type of the listed resources. If None, no parameters are added.
+            properties (list | None): Properties to extract, used to only request the fields they belong to
+
+        Returns:
+            dict: Query parameters
+        """
+        if resource_type is None or not self._query_params_supported:
+            return {}
+
+        params = {"page[size]": API_PAGE_SIZE}
+
+        # Sparse fieldsets only select top-level fields (e.g. "vcs-repo" for "attributes.vcs-repo.branch")
+        fields = {
+            property_.split(".")[1]
+            for property_ in properties or []
+            if property_.startswith(("attributes.", "relationships."))
+        }
+        if fields:
+            params[f"fields[{resource_type}]"] = ",".join(sorted(fields))
+
+        return params
 
     def _build_stack_slug(self, workspace: dict) -> str:
         return slugify(workspace.get("attributes.name"))
@@ -39,20 +111,15 @@ class TerraformExporter(BaseExporter):
         drop_response_properties: list | None = None,
         method: str = "GET",
         request_data: dict | None = None,
+        cache: bool = True,
     ) -> dict:
         logging.info("Start calling API")
 
-        headers = {
-            "Authorization": f"Bearer {self._config.get('api_token')}",
-            "Content-Type": "application/vnd.api+json",
-        }
-
         try:
             if request_data is not None:
                 request_data = json.dumps(request_data)
 
-            response = requests.request(data=request_data, headers=headers, method=method, url=url)
-            logging.debug(request_dump.dump_all(response).decode("utf-8"))
+            response = self._get_transport().request(cache=cache, data=request_data, method=method, url=url)
             response.raise_for_status()
         except requests.exceptions.HTTPError as e:
             # Return None for non-existent API endpoints as we are most likely interacting with an older TFE version
@@ -69,18 +136,27 @@ class TerraformExporter(BaseExporter):
             raise RuntimeError(f"Error for {url}") from e
 
         if drop_response_properties:
-            # Drop properties, mostly when they contain the keypath separator benedict uses (ie ".")
-            data = benedict(pydash.omit(response.json(), drop_response_properties))
+            # Drop properties, mostly when they contain the keypath separator (ie ".")
+            data = Record.from_data(pydash.omit(response.json(), drop_response_properties))
         elif len(response.content) == 0:
             # The response has no content (e.g. 204 HTTP status code)
-            data = benedict()
+            data = Record()
         else:
-            data = benedict(response.json())
+            data = Record.from_data(response.json())
 
         logging.info("Stop calling API")
 
         return data
 
+    def _cancel_run(self, id_: str) -> None:
+        logging.info(f"Canceling '{id_}' run")
+
+        try:
+            self._extract_data_from_api(method="POST", path=f"/runs/{id_}/actions/cancel")
+        except RuntimeError as e:
+            # The run might have completed in the meantime
+            logging.warning(f"Could not cancel '{id_}' run: {e}. Ignoring.")
+
     def _check_data(self, data: list[dict]) -> list[dict]:
         logging.info("Start checking data")
 
@@ -154,11 +230,10 @@ class TerraformExporter(BaseExporter):
     def _check_workspace_variables_data(self, data: list[dict]) -> list[dict]:
         logging.info("Start checking workspace variables data")
 
-        prog = re.compile("^[a-zA-Z_]+[a-zA-Z0-9_]*$")
         for key, item in enumerate(data):
             warnings = []
 
-            if not re.search(prog, item.get("attributes.key")):
+            if not self._is_valid_env_var_name(item.get("attributes.key")):
                 warnings.append("Key is an invalid env var name")
 
             data[key]["warnings"] = ", ".join(warnings)
@@ -186,10 +261,22 @@ class TerraformExporter(BaseExporter):
         return data
 
     def _create_agent_pool(self, organization_id: str) -> str:
+        # Reuse the pool left by a previous export, or created manually, so that its agents keep working
+        agent_pools_data = self._extract_data_from_api(
+            cache=False,
+            path=f"/organizations/{organization_id}/agent-pools",
+            properties=["attributes.name", "id"],
+        )
+        for agent_pool_data in agent_pools_data:
+            if agent_pool_data.get("attributes.name") == AGENT_POOL_NAME:
+                logging.info(f"Reusing existing '{agent_pool_data.get('id')}' agent pool")
+
+                return agent_pool_data.get("id")
+
         agent_pool_request_data = {
             "data": {
                 "attributes": {
-                    "name": "SMK",
+                    "name": AGENT_POOL_NAME,
                     "organization-scoped": True,
                 },
                 "type": "agent-pools",
@@ -202,6 +289,7 @@ class TerraformExporter(BaseExporter):
             request_data=agent_pool_request_data,
         )
         agent_pool_id = agent_pool_data[0].get("id")
+        self._created_agent_pool_ids.add(agent_pool_id)
         logging.info(f"Created '{agent_pool_id}' agent pool")
 
         return agent_pool_id
@@ -229,249 +317,255 @@ class TerraformExporter(BaseExporter):
         return agent_token
 
     def _delete_agent_pool(self, id_: str) -> None:
+        if id_ not in self._created_agent_pool_ids or self._config.get("keep_agents", False):
+            logging.info(f"Keep existing '{id_}' agent pool")
+            return
+
         logging.info(f"Deleting '{id_}' agent pool")
         self._extract_data_from_api(
             method="DELETE",
             path=f"/agent-pools/{id_}",
         )
 
+    def _download_file(self, path: Path, url: str) -> str:
+        """Download a file to disk without holding its content in memory
+
+        Args:
+            path (Path): Path of the local file
+            url (str): URL of the file
+
+        Returns:
+            str: SHA-256 checksum of the file content
+        """
+        logging.info("Start downloading file")
+
+        checksum = hashlib.sha256()
+
+        try:
+            # The file content is never traced as it contains secret values
+            with self._get_transport().request(allow_redirects=True, method="GET", stream=True, url=url) as response:
+                response.raise_for_status()
+
+                with open_atomically(path, mode="wb") as fp:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        checksum.update(chunk)
+                        fp.write(chunk)
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Error downloading {url}") from e
+
+        logging.info("Stop downloading file")
+
+        return checksum.hexdigest()
+
     def _download_text_file(self, url: str) -> str:
         logging.info("Start downloading text file")
 
-        headers = {
-            "Authorization": f"Bearer {self._config.get('api_token')}",
-        }
-        response = requests.get(allow_redirects=True, headers=headers, url=url)
-        logging.debug(request_dump.dump_all(response).decode("utf-8"))
+        # State files and plan logs contain secret values, so their content is never traced
+        response = self._get_transport().request(allow_redirects=True, method="GET", trace_body=False, url=url)
 
         logging.info("Stop downloading text file")
 
         return response.text
 
-    def _download_state_files(self, data: dict) -> None:
-        logging.info("Start downloading state files")
-
-        for workspace in data.get("workspaces"):
-            state_version_id = workspace.get("relationships.current-state-version.data.id")
-            if state_version_id:
-                state_version_data = self._extract_data_from_api(
-                    drop_response_properties=[
-                        "data.attributes.modules",
-                        "data.attributes.providers",
-                        "data.attributes.resources",
-                    ],
-                    path=f"/state-versions/{state_version_id}",
-                    properties=["attributes.hosted-state-download-url"],
-                )
+    def _download_state_file(self, workspace: dict, manifest_entry: dict | None) -> dict | None:
+        """Download the current state file of a workspace, unless it has not changed since the last download
 
-                state_file_content = self._download_text_file(
-                    url=state_version_data[0].get("attributes.hosted-state-download-url")
-                )
+        Args:
+            workspace (dict): Workspace data
+            manifest_entry (dict | None): Information about the last download of the workspace state file, if any
 
-                # KLUDGE: The Terraform API response is returned a "application/octet-stream"
-                # and includes encoded unicode characters that need to be decoded before saving the state file
-                state_file_content = json.dumps(json.loads(state_file_content), indent=2)
+        Returns:
+            dict | None: Information about the downloaded state file, or None if the workspace has no state
+        """
+        state_version_id = workspace.get("relationships.current-state-version.data.id")
+        if not state_version_id:
+            return None
 
-                organization_id = workspace.get("relationships.organization.data.id")
-                workspace_id = workspace.get("id")
+        organization_id = workspace.get("relationships.organization.data.id")
+        workspace_id = workspace.get("id")
+        path = Path(get_tmp_subfolder(f"state-files/{organization_id}"), f"{workspace_id}.tfstate")
+
+        if manifest_entry and manifest_entry.get("state_version_id") == state_version_id and path.exists():
+            # The local file might have been modified or truncated since it was downloaded
+            if self._get_file_checksum(path) == manifest_entry.get("sha256"):
+                logging.debug(f"State file for '{organization_id}/{workspace_id}' has not changed. Skipping.")
+                return manifest_entry
+
+            logging.debug(f"State file for '{organization_id}/{workspace_id}' has been modified. Downloading again.")
+
+        # The download URL expires, so it is never cached
+        state_version_data = self._extract_data_from_api(
+            cache=False,
+            drop_response_properties=[
+                "data.attributes.modules",
+                "data.attributes.providers",
+                "data.attributes.resources",
+            ],
+            path=f"/state-versions/{state_version_id}",
+            properties=["attributes.hosted-state-download-url", "attributes.serial"],
+        )[
+            0
+        ]  # KLUDGE: There should be a way to pull single item from the API instead of a list of items
+
+        logging.debug(f"Saving state file for '{organization_id}/{workspace_id}' to '{path}'")
+        checksum = self._download_file(path=path, url=state_version_data.get("attributes.hosted-state-download-url"))
+        lineage = self._read_state_file_lineage(path)
+
+        if self._config.get("normalize_state_files", False):
+            self._normalize_state_file(path)
+            checksum = self._get_file_checksum(path)
+
+        return {
+            "lineage": lineage,
+            "organization_id": organization_id,
+            "serial": state_version_data.get("attributes.serial"),
+            "sha256": checksum,
+            "state_version_id": state_version_id,
+            "workspace_id": workspace_id,
+        }
 
-                path = Path(get_tmp_subfolder(f"state-files/{organization_id}"), f"{workspace_id}.tfstate")
-                with path.open("w", encoding="utf-8") as fp:
-                    logging.debug(f"Saving state file for '{organization_id}/{workspace_id}' to '{path}'")
-                    fp.write(state_file_content)
+    def _download_state_files(self, data: dict) -> None:
+        logging.info("Start downloading state files")
 
-        logging.info("Stop downloading state files")
+        manifest = self._load_state_files_manifest()
+        # Drop the line partially written by an interrupted export, as new entries would be appended to it otherwise
+        self._save_state_files_manifest(manifest)
+        manifest_path = self._get_state_files_manifest_path()
+        manifest_lock = threading.Lock()
 
-    # KLUDGE: We should break this function down in smaller functions
-    def _enrich_workspace_variable_data(self, data: dict) -> dict:  # noqa: PLR0912, PLR0915
-        def find_workspace(data: dict, workspace_id: str) -> dict:
-            for workspace in data.get("workspaces"):
-                if workspace.get("id") == workspace_id:
-                    return workspace
+        # New entries are appended as soon as a download completes so that an interrupted export does not have to
+        # download the same state files again
+        with manifest_path.open("a", encoding="utf-8") as manifest_fp:
 
-            logging.warning(f"Could not find workspace '{workspace_id}'")
+            def download(workspace: dict) -> None:
+                previous_entry = manifest.get(workspace.get("id"))
+                entry = self._download_state_file(workspace=workspace, manifest_entry=previous_entry)
 
-            return None
+                if entry and entry != previous_entry:
+                    with manifest_lock:
+                        manifest[entry["workspace_id"]] = entry
+                        manifest_fp.write(f"{json.dumps(entry, sort_keys=True)}\n")
+                        manifest_fp.flush()
 
-        def find_variable(data: dict, variable_id: str) -> dict:
-            for variable in data.get("workspace_variables"):
-                if variable.get("id") == variable_id:
-                    return variable
+            self._map_concurrently(download, data.get("workspaces"))
 
-            logging.warning(f"Could not find variable '{variable_id}'")
+        self._save_state_files_manifest(manifest)
 
-            return None
+        logging.info("Stop downloading state files")
 
+    def _enrich_workspace_variable_data(self, data: dict) -> dict:
         if not is_command_available(["docker", "ps"], execute=True):
             logging.warning("Docker is not available. Skipping enriching workspace variables data.")
             return data
 
         logging.info("Start enriching workspace variables data")
 
-        # List organizations, workspaces and associated variables
-        organizations = benedict()
+        workspaces_index = EntityIndex(data.get("workspaces"))
+
+        # List organizations, workspaces and associated sensitive variables
+        organizations = {}
         for variable in data.get("workspace_variables"):
             if variable.get("attributes.sensitive") is False:
                 continue
 
             workspace_id = variable.get("relationships.workspace.data.id")
-            organization_id = find_workspace(data, workspace_id).get("relationships.organization.data.id")
+            workspace = workspaces_index.find(workspace_id)
+            if workspace is None:
+                logging.warning(f"Could not find workspace '{workspace_id}'")
+                continue
 
-            if organization_id not in organizations:
-                organizations[organization_id] = benedict()
+            organization_id = workspace.get("relationships.organization.data.id")
+            organizations.setdefault(organization_id, {}).setdefault(workspace_id, (workspace, []))[1].append(variable)
 
-            if workspace_id not in organizations[organization_id]:
-                organizations[organization_id][workspace_id] = benedict()
+        # Values harvested by an interrupted export are reused when it is resumed
+        journal = self._get_journal("workspace_variable_values")
+        for organization_id, workspaces in organizations.items():
+            pending_workspaces = []
+            for workspace, variables in workspaces.values():
+                env_vars = journal.get(workspace.get("id"))
+                if env_vars is None:
+                    pending_workspaces.append((workspace, variables))
+                else:
+                    self._set_workspace_variable_values(workspace=workspace, variables=variables, env_vars=env_vars)
 
-            organizations[organization_id][workspace_id][variable.get("id")] = variable.get("attributes.key")
+            if len(pending_workspaces) > 0:
+                self._enrich_organization_workspace_variable_data(
+                    organization_id=organization_id, workspaces=pending_workspaces
+                )
 
-        if len(organizations) == 0 or len(organizations.keys()) == 0:
-            return data
+        logging.info("Stop enriching workspace variables data")
 
-        for organization_id, workspaces in organizations.items():
-            logging.info(f"Start local TFC/TFE agent for organization '{organization_id}'")
+        return data
 
-            agent_pool_id = self._create_agent_pool(organization_id=organization_id)
+    def _enrich_organization_workspace_variable_data(
+        self, organization_id: str, workspaces: list[tuple[dict, list[dict]]]
+    ) -> None:
+        """Retrieve the sensitive variable values for the workspaces of an organization
 
-            try:
-                agent_container_name = f"smk-tfc-agent-{organization_id}"
-                agent_container = self._start_agent_container(
-                    agent_pool_id=agent_pool_id, container_name=agent_container_name
-                )
+        One plan-only run is kept in flight per local agent, so the organization workspaces are processed by
+        "agent_count" agents in parallel.
 
-                # Store the container ID in case it gets stopped and we need it for the error message
-                agent_container_id = agent_container.id
+        Args:
+            organization_id (str): Organization ID
+            workspaces (list[tuple[dict, list[dict]]]): Workspaces and their sensitive variables
+        """
+        logging.info(f"Start local TFC/TFE agents for organization '{organization_id}'")
 
-                for workspace_id, workspace_variables in workspaces.items():
-                    current_configuration_version_id = find_workspace(data, workspace_id).get(
-                        "relationships.current-configuration-version.data.id"
-                    )
-                    if current_configuration_version_id is None:
-                        logging.warning(
-                            f"Workspace '{organization_id}/{workspace_id}' has no current configuration. Ignoring."
-                        )
-                        continue
-
-                    logging.info(f"Backing up the '{organization_id}/{workspace_id}' workspace execution mode")
-                    workspace_data_backup = self._extract_data_from_api(
-                        path=f"/workspaces/{workspace_id}",
-                        properties=[
-                            "attributes.execution-mode",
-                            "attributes.setting-overwrites",
-                            "relationships.agent-pool",
-                        ],
-                    )[
-                        0
-                    ]  # KLUDGE: There should be a way to pull single item from the API instead of a list of items
-
-                    logging.info(f"Updating the '{organization_id}/{workspace_id}' workspace to use the TFC Agent")
-                    self._extract_data_from_api(
-                        method="PATCH",
-                        path=f"/workspaces/{workspace_id}",
-                        request_data={
-                            "data": {
-                                "attributes": {
-                                    "agent-pool-id": agent_pool_id,
-                                    "execution-mode": "agent",
-                                    "setting-overwrites": {"execution-mode": True, "agent-pool": True},
-                                },
-                                "type": "workspaces",
-                            }
-                        },
-                    )
+        agent_count = max(1, min(int(self._config.get("agent_count", 1)), len(workspaces)))
+        # Agents serve every workspace of the organization, so they export the variables of all of them
+        variable_names = {variable.get("attributes.key") for _, variables in workspaces for variable in variables}
+        variable_names.add("ATLAS_CONFIGURATION_VERSION_GITHUB_BRANCH")
+        agent_containers = []
+        agent_pool_id = self._create_agent_pool(organization_id=organization_id)
 
-                    logging.info(f"Trigger a plan for the '{organization_id}/{workspace_id}' workspace")
-                    run_data = self._extract_data_from_api(
-                        method="POST",
-                        path="/runs",
-                        properties=["relationships.plan.data.id"],
-                        request_data={
-                            "data": {
-                                "attributes": {
-                                    "allow-empty-apply": False,
-                                    "plan-only": True,
-                                    "refresh": False,  # No need to waste time refreshing the state
-                                },
-                                "relationships": {
-                                    "workspace": {"data": {"id": workspace_id, "type": "workspaces"}},
-                                },
-                                "type": "runs",
-                            }
-                        },
-                    )[
-                        0
-                    ]  # KLUDGE: There should be a way to pull single item from the API instead of a list of items
-
-                    logging.info("Retrieve the output for the plan")
-                    plan_id = run_data.get("relationships.plan.data.id")
-                    plan_data = self._get_plan(id_=plan_id)
-
-                    if plan_data.get("attributes.log-read-url"):
-                        logs_data = self._download_text_file(url=plan_data.get("attributes.log-read-url"))
-
-                        logging.debug("Plan output:")
-                        logging.debug(logs_data)
-
-                        logging.info("Extract the env var values from the plan output")
-                        for line in logs_data.split("\n"):
-                            for workspace_variable_id, workspace_variable_name in workspace_variables.items():
-                                prefix = f"{workspace_variable_name}="
-                                if line.startswith(prefix):
-                                    value = line.removeprefix(prefix)
-                                    masked_value = "*" * len(value)
-
-                                    logging.debug(
-                                        f"Found sensitive env var: '{workspace_variable_name}={masked_value}'"
-                                    )
-
-                                    variable = find_variable(data, workspace_variable_id)
-                                    variable["attributes.value"] = value
-
-                                # KLUDGE: Ideally this should be retrieved independently for more clarity,
-                                # and only if needed.
-                                if line.startswith("ATLAS_CONFIGURATION_VERSION_GITHUB_BRANCH="):
-                                    branch_name = line.removeprefix("ATLAS_CONFIGURATION_VERSION_GITHUB_BRANCH=")
-                                    workspace = find_workspace(data, workspace_id)
-                                    if workspace and not workspace.get("attributes.vcs-repo.branch"):
-                                        workspace["attributes.vcs-repo.branch"] = branch_name
-
-                    logging.info(f"Restoring the '{organization_id}/{workspace_id}' workspace execution mode")
-                    self._extract_data_from_api(
-                        method="PATCH",
-                        path=f"/workspaces/{workspace_id}",
-                        request_data={
-                            "data": {
-                                "attributes": {
-                                    "execution-mode": workspace_data_backup.get("attributes.execution-mode"),
-                                    "setting-overwrites": workspace_data_backup.get("attributes.setting-overwrites"),
-                                },
-                                "relationships": {
-                                    "agent-pool": workspace_data_backup.get("relationships.agent-pool"),
-                                },
-                                "type": "workspaces",
-                            }
-                        },
-                    )
+        try:
+            for index in range(agent_count):
+                # The first agent keeps the historical container name so existing containers can be reused
+                agent_container_name = f"smk-tfc-agent-{organization_id}"
+                if index > 0:
+                    agent_container_name += f"-{index + 1}"
 
+                agent_container = self._start_agent_container(
+                    agent_pool_id=agent_pool_id,
+                    container_name=agent_container_name,
+                    variable_names=sorted(variable_names),
+                )
+                if agent_container:
+                    agent_containers.append(agent_container)
+
+            if len(agent_containers) == 0:
+                logging.error(f"No local TFC/TFE agent available for organization '{organization_id}'. Skipping.")
+                return
+
+            self._map_concurrently(
+                lambda item: self._harvest_workspace_variables(
+                    agent_pool_id=agent_pool_id, workspace=item[0], variables=item[1]
+                ),
+                workspaces,
+                concurrency=len(agent_containers),
+            )
+
+            for agent_container in agent_containers:
                 if agent_container.exists() and agent_container.state.running:
-                    logging.debug(f"Local TFC/TFE agent Docker container '{agent_container_id}' logs:")
+                    logging.debug(f"Local TFC/TFE agent Docker container '{agent_container.id}' logs:")
                     logging.debug(agent_container.logs())
                 else:
                     logging.warning(
-                        f"Local TFC/TFE agent Docker container '{agent_container_id}' "
+                        f"Local TFC/TFE agent Docker container '{agent_container.id}' "
                         "was already stopped when we tried to pull the logs. Skipping."
                     )
-            finally:
-                logging.info(f"Stop local TFC/TFE agent for organization '{organization_id}'")
+        finally:
+            logging.info(f"Stop local TFC/TFE agents for organization '{organization_id}'")
+            for agent_container in agent_containers:
                 self._stop_agent_container(agent_container)
 
-                self._delete_agent_pool(id_=agent_pool_id)
-
-        logging.info("Stop enriching workspace variables data")
-
-        return data
+            self._delete_agent_pool(id_=agent_pool_id)
 
     def _enrich_data(self, data: dict) -> dict:
+        if self._is_offline():
+            logging.warning("Offline mode. Skipping downloading state files and sensitive variable values.")
+            return data
+
         logging.info("Start enriching data")
 
         self._download_state_files(data)
@@ -482,30 +576,33 @@ class TerraformExporter(BaseExporter):
         return data
 
     def _expand_relationships(self, data: dict) -> dict:
-        def find_entity(data: dict, type_: str, id_: str) -> dict:
+        def find_entity(type_: str, id_: str) -> dict:
             # Pluralize the type
-            type_ = f"{type_}s"
-            for src_datum in data.get(type_):
-                if src_datum.get("_source_id") == id_:
-                    # Clone to avoid modifying the original dict when removing the relationships
-                    # on the expanded relationship
-                    datum = src_datum.clone()
+            src_datum = indexes[f"{type_}s"].find(id_, key="_source_id")
+            if src_datum is None:
+                return None
 
-                    if "_relationships" in datum:
-                        del datum["_relationships"]
+            # Clone to avoid modifying the original dict when removing the relationships on the expanded relationship
+            datum = src_datum.clone()
 
-                    return datum
+            if "_relationships" in datum:
+                del datum["_relationships"]
 
-            return None
+            return datum
 
         logging.info("Start expanding relationships")
 
+        # Keep related entity IDs and let the data loader resolve them, instead of embedding a copy of each related
+        # entity in the data file
+        normalize = self._config.get("normalize_relationships", False)
+        indexes = {entity_type: EntityIndex(entity_data) for entity_type, entity_data in data.items()}
+
         for entity_data in data.values():
             for datum in entity_data:
                 relationships = {}
                 if datum.get("_relationships"):
                     for type_, id_ in datum.get("_relationships").items():
-                        relationships[type_] = find_entity(data=data, id_=id_, type_=type_)
+                        relationships[type_] = id_ if normalize else find_entity(id_=id_, type_=type_)
 
                 datum.update(
                     {"_migration_id": self._generate_migration_id(datum.get("name")), "_relationships": relationships}
@@ -517,7 +614,12 @@ class TerraformExporter(BaseExporter):
 
     def _extract_data(self) -> list[dict]:
         logging.info("Start extracting data")
-        data = benedict(
+
+        if self._config.get("incremental", False):
+            self._previous_extraction = self._load_extraction()
+            if self._previous_extraction is None:
+                logging.warning("Could not find data extracted by a previous export. Extracting all data.")
+        data = Record(
             {
                 "agent_pools": [],
                 "modules": [],
@@ -534,26 +636,36 @@ class TerraformExporter(BaseExporter):
             }
         )
 
-        for organization in data.organizations:
-            data["agent_pools"].extend(self._extract_agent_pools_data(organization))
-            data["modules"].extend(self._extract_modules_data(organization))
-            data["policies"].extend(self._extract_policies_data(organization))
-            data["policy_sets"].extend(self._extract_policy_sets_data(organization))
-            data["projects"].extend(self._extract_projects_data(organization))
-            data["providers"].extend(self._extract_providers_data(organization))
-            data["tasks"].extend(self._extract_tasks_data(organization))
-            data["teams"].extend(self._extract_teams_data(organization))
-            data["variable_sets"].extend(self._extract_variable_sets_data(organization))
-            data["workspaces"].extend(self._extract_workspaces_data(organization))
-
-        for workspace in data.workspaces:
-            data["workspace_variables"].extend(self._extract_workspace_variables_data(workspace))
+        # Each organization and entity type is listed independently, and results are merged back in a fixed order so
+        # that the output does not depend on the concurrency setting.
+        extractors = {
+            "agent_pools": self._extract_agent_pools_data,
+            "modules": self._extract_modules_data,
+            "policies": self._extract_policies_data,
+            "policy_sets": self._extract_policy_sets_data,
+            "projects": self._extract_projects_data,
+            "providers": self._extract_providers_data,
+            "tasks": self._extract_tasks_data,
+            "teams": self._extract_teams_data,
+            "variable_sets": self._extract_variable_sets_data,
+            "workspaces": self._extract_workspaces_data,
+        }
+        tasks = [
+            (entity_type, organization) for organization in data.get("organizations") for entity_type in extractors
+        ]
+        results = self._map_concurrently(lambda task: extractors[task[0]](task[1]), tasks)
+        for (entity_type, _), result in zip(tasks, results, strict=True):
+            data[entity_type].extend(result)
+
+        # Workspace variables can only be listed one workspace at a time, so the calls are pipelined instead
+        for result in self._map_concurrently(self._extract_workspace_variables_data, data.get("workspaces")):
+            data["workspace_variables"].extend(result)
 
         logging.info("Stop extracting data")
 
         return data
 
-    def _extract_data_from_api(
+    def _extract_data_from_api(  # noqa: PLR0912, PLR0913
         self,
         path: str,
         drop_response_properties: list | None = None,
@@ -561,6 +673,8 @@ class TerraformExporter(BaseExporter):
         method: str = "GET",
         properties: list | None = None,
         request_data: dict | None = None,
+        cache: bool = True,
+        resource_type: str | None = None,
     ) -> list[dict]:
         logging.info("Start extracting data from API")
 
@@ -569,12 +683,31 @@ class TerraformExporter(BaseExporter):
 
         endpoint = self._config.get("api_endpoint", "https://app.terraform.io")
         url = f"{endpoint}/api/v2{path}"
+        query_params = self._build_query_params(resource_type, properties) if method == "GET" else {}
 
         raw_data = []
         while True:
-            response_payload = self._call_api(
-                url, drop_response_properties=drop_response_properties, method=method, request_data=request_data
-            )
+            try:
+                response_payload = self._call_api(
+                    self._add_query_params(url, query_params),
+                    cache=cache,
+                    drop_response_properties=drop_response_properties,
+                    method=method,
+                    request_data=request_data,
+                )
+            except RuntimeError as e:
+                # Older TFE versions might reject the page size or sparse fieldsets. They are not used anymore then.
+                bad_request = (
+                    isinstance(e.__cause__, requests.exceptions.HTTPError)
+                    and e.__cause__.response.status_code == HTTPStatus.BAD_REQUEST
+                )
+                if not query_params or not bad_request:
+                    raise
+
+                logging.warning(f"API rejected the {', '.join(query_params)} query parameters. Ignoring them.")
+                self._query_params_supported = False
+                query_params = {}
+                continue
 
             if response_payload.get("data"):
                 if isinstance(response_payload["data"], dict):  # Individual resource
@@ -589,18 +722,15 @@ class TerraformExporter(BaseExporter):
                 break
 
         include_regex = re.compile(include_pattern)
+        project = compile_projection(properties) if properties else None
 
         data = []
         for raw_datum in raw_data:
             if raw_datum.get("attributes.name") and include_regex.match(raw_datum.get("attributes.name")) is None:
                 continue
 
-            if properties:
-                # KLUDGE: There must be a cleaner way to handle this
-                datum = benedict()
-                for property_ in properties:
-                    datum[property_] = raw_datum.get(property_)
-                data.append(datum)
+            if project:
+                data.append(project(raw_datum))
 
         logging.info("Stop extracting data from API")
 
@@ -620,6 +750,7 @@ class TerraformExporter(BaseExporter):
             include_pattern=self._config.get("include.agent_pools"),
             path=f"/organizations/{organization.get('id')}/agent-pools",
             properties=properties,
+            resource_type="agent-pools",
         )
 
         logging.info("Stop extracting agent pools data")
@@ -631,34 +762,39 @@ class TerraformExporter(BaseExporter):
 
         properties = [
             "attributes.name",
-            "attributes.namespace",
             "attributes.provider",
             "attributes.registry-name",
+            "attributes.status",
+            "attributes.updated-at",
+            "attributes.vcs-repo.branch",
+            "attributes.vcs-repo.identifier",
             "id",
+            "relationships.organization.data.id",
         ]
         list_data = self._extract_data_from_api(
             include_pattern=self._config.get("include.modules"),
             path=f"/organizations/{organization.get('id')}/registry-modules",
-            properties=properties,
+            properties=[*properties, "attributes.namespace"],
+            resource_type="registry-modules",
         )
 
         data = []
         for list_datum in list_data:
-            module_data = self._extract_data_from_api(
-                path=f"/organizations/{organization.get('id')}/registry-modules/{list_datum.get('attributes.registry-name')}/{list_datum.get('attributes.namespace')}/{list_datum.get('attributes.name')}/{list_datum.get('attributes.provider')}",
-                properties=[
-                    "attributes.name",
-                    "attributes.provider",
-                    "attributes.registry-name",
-                    "attributes.status",
-                    "attributes.vcs-repo.branch",
-                    "attributes.vcs-repo.identifier",
-                    "id",
-                    "relationships.organization.data.id",
-                ],
-            )[
-                0
-            ]  # KLUDE: There should be a way to pull single item from the API instead of a list of items
+            previous_module_data = self._find_unchanged_entity("modules", list_datum, ["attributes.updated-at"])
+            if previous_module_data is not None:
+                data.append(previous_module_data)
+                continue
+
+            # Recent API versions list modules with all their attributes, making it unnecessary to pull them one by one
+            if list_datum.get("attributes.status") is not None:
+                module_data = compile_projection(properties)(list_datum)
+            else:
+                module_data = self._extract_data_from_api(
+                    path=f"/organizations/{organization.get('id')}/registry-modules/{list_datum.get('attributes.registry-name')}/{list_datum.get('attributes.namespace')}/{list_datum.get('attributes.name')}/{list_datum.get('attributes.provider')}",
+                    properties=properties,
+                )[
+                    0
+                ]  # KLUDE: There should be a way to pull single item from the API instead of a list of items
 
             data.append(module_data)
 
@@ -671,7 +807,10 @@ class TerraformExporter(BaseExporter):
 
         properties = ["attributes.email", "attributes.name", "id"]
         data = self._extract_data_from_api(
-            include_pattern=self._config.get("include.organizations"), path="/organizations", properties=properties
+            include_pattern=self._config.get("include.organizations"),
+            path="/organizations",
+            properties=properties,
+            resource_type="organizations",
         )
 
         logging.info("Stop extracting organizations data")
@@ -693,6 +832,7 @@ class TerraformExporter(BaseExporter):
             include_pattern=self._config.get("include.policies"),
             path=f"/organizations/{organization.get('id')}/policies",
             properties=properties,
+            resource_type="policies",
         )
 
         logging.info("Stop extracting policies data")
@@ -715,6 +855,7 @@ class TerraformExporter(BaseExporter):
             include_pattern=self._config.get("include.policy_sets"),
             path=f"/organizations/{organization.get('id')}/policy-sets",
             properties=properties,
+            resource_type="policy-sets",
         )
 
         logging.info("Stop extracting policy sets data")
@@ -733,6 +874,7 @@ class TerraformExporter(BaseExporter):
             include_pattern=self._config.get("include.projects"),
             path=f"/organizations/{organization.get('id')}/projects",
             properties=properties,
+            resource_type="projects",
         )
 
         logging.info("Stop extracting projects data")
@@ -753,6 +895,7 @@ class TerraformExporter(BaseExporter):
             include_pattern=self._config.get("include.providers"),
             path=f"/organizations/{organization.get('id')}/registry-providers",
             properties=properties,
+            resource_type="registry-providers",
         )
 
         logging.info("Stop extracting providers data")
@@ -775,6 +918,7 @@ class TerraformExporter(BaseExporter):
             include_pattern=self._config.get("include.tasks"),
             path=f"/organizations/{organization.get('id')}/tasks",
             properties=properties,
+            resource_type="tasks",
         )
 
         logging.info("Stop extracting tasks data")
@@ -794,6 +938,7 @@ class TerraformExporter(BaseExporter):
             include_pattern=self._config.get("include.teams"),
             path=f"/organizations/{organization.get('id')}/teams",
             properties=properties,
+            resource_type="teams",
         )
 
         logging.info("Stop extracting teams data")
@@ -817,6 +962,7 @@ class TerraformExporter(BaseExporter):
             include_pattern=self._config.get("include.variable_sets"),
             path=f"/organizations/{organization.get('id')}/varsets",
             properties=properties,
+            resource_type="varsets",
         )
 
         logging.info("Stop extracting variable sets data")
@@ -824,6 +970,22 @@ class TerraformExporter(BaseExporter):
         return data
 
     def _extract_workspace_variables_data(self, workspace: dict) -> list[dict]:
+        # Variables extracted by an interrupted export are reused when it is resumed
+        journal = self._get_journal("workspace_variables")
+        if workspace.get("id") in journal:
+            logging.debug(f"Reusing the variables of the '{workspace.get('id')}' workspace from the previous export")
+            return [Record.from_data(variable) for variable in journal.get(workspace.get("id"))]
+
+        # Variables of workspaces that have not changed since the previous export are reused
+        timestamp_keys = ["attributes.latest-change-at", "attributes.updated-at"]
+        if self._find_unchanged_entity("workspaces", workspace, timestamp_keys):
+            logging.debug(f"Reusing the variables of the unchanged '{workspace.get('id')}' workspace")
+            return list(
+                self._get_entity_index(self._previous_extraction.get("workspace_variables")).find_all(
+                    workspace.get("id"), key="relationships.workspace.data.id"
+                )
+            )
+
         logging.info("Start extracting workspace variables data")
 
         properties = [
@@ -840,7 +1002,9 @@ class TerraformExporter(BaseExporter):
             include_pattern=self._config.get("include.workspace_variables"),
             path=f"/workspaces/{workspace.get('id')}/vars",
             properties=properties,
+            resource_type="vars",
         )
+        journal.record(workspace.get("id"), data)
 
         logging.info("Stop extracting workspace variables data")
 
@@ -852,9 +1016,11 @@ class TerraformExporter(BaseExporter):
         properties = [
             "attributes.auto-apply",
             "attributes.description",
+            "attributes.latest-change-at",
             "attributes.name",
             "attributes.resource-count",
             "attributes.terraform-version",
+            "attributes.updated-at",
             "attributes.vcs-repo.branch",
             "attributes.vcs-repo.identifier",
             "attributes.vcs-repo.service-provider",
@@ -869,6 +1035,7 @@ class TerraformExporter(BaseExporter):
             include_pattern=self._config.get("include.workspaces"),
             path=f"/organizations/{organization.get('id')}/workspaces",
             properties=properties,
+            resource_type="workspaces",
         )
 
         logging.info("Stop extracting workspaces data")
@@ -878,39 +1045,329 @@ class TerraformExporter(BaseExporter):
     def _find_entity(self, data: list[dict], id_: str) -> dict | None:
         logging.debug(f"Start searching for entity ({id_})")
 
-        entity = None
-        for datum in data:
-            if datum.get("id") == id_:
-                entity = datum
-                break
+        entity = self._get_entity_index(data).find(id_)
 
         logging.debug(f"Stop searching for entity ({id_})")
 
         return entity
 
+    def _find_unchanged_entity(self, entity_type: str, entity: dict, keys: list[str]) -> dict | None:
+        """Find an entity in the data extracted by the previous export, if it has not changed since
+
+        Args:
+            entity_type (str): Entity type (e.g. "workspaces")
+            entity (dict): Entity, as currently listed by the API
+            keys (list[str]): Keypaths of the timestamps that change when the entity is updated
+
+        Returns:
+            dict | None: Previous entity, or None if there is no previous export or the entity changed since
+        """
+        if self._previous_extraction is None or entity_type not in self._previous_extraction:
+            return None
+
+        previous_entity = self._get_entity_index(self._previous_extraction.get(entity_type)).find(entity.get("id"))
+        if previous_entity is None:
+            return None
+
+        for key in keys:
+            if entity.get(key) is None or entity.get(key) != previous_entity.get(key):
+                return None
+
+        return previous_entity
+
     def _generate_migration_id(self, *args: str) -> str:
         return slugify("_".join(args)).replace("-", "_")
 
+    def _get_concurrency(self) -> int:
+        return max(1, int(self._config.get("concurrency", 1)))
+
+    def _get_entity_index(self, data: list[dict]) -> EntityIndex:
+        # Indexes are cached per list, and rebuilt if entities have been added or removed since
+        index = self._entity_indexes.get(id(data))
+        if index is None or index[0] is not data or len(index[1]) != len(data):
+            index = (data, EntityIndex(data))
+            self._entity_indexes[id(data)] = index
+
+        return index[1]
+
+    def _get_file_checksum(self, path: Path) -> str:
+        with path.open("rb") as fp:
+            return hashlib.file_digest(fp, "sha256").hexdigest()
+
     def _get_plan(self, id_: str) -> dict:
+        """Wait for a plan to complete and return its data
+
+        The plan status is polled with an interval starting at "plan_poll_interval" seconds and doubling up to
+        "plan_poll_max_interval" seconds, reset every time the status changes. Waiting stops if the plan stays in a
+        status longer than allowed by "plan_status_timeouts", or does not complete within "plan_timeout" seconds.
+
+        Args:
+            id_ (str): Plan ID
+
+        Returns:
+            dict: Plan data, with the status the plan had when waiting stopped
+        """
+        min_interval = float(self._config.get("plan_poll_interval", 0.5))
+        max_interval = float(self._config.get("plan_poll_max_interval", 10))
+        status_timeouts = {**PLAN_STATUS_TIMEOUTS, **self._config.get("plan_status_timeouts", {})}
+
+        durations = {}
+        interval = min_interval
+        previous_status = None
+        started_at = polled_at = status_changed_at = time.monotonic()
+        deadline = started_at + float(self._config.get("plan_timeout", 3600))
+
         while True:
             data = self._extract_data_from_api(
-                path=f"/plans/{id_}", properties=["attributes.log-read-url", "attributes.status"]
+                cache=False, path=f"/plans/{id_}", properties=["attributes.log-read-url", "attributes.status"]
             )[
                 0
             ]  # KLUDGE: There should be a way to pull single item from the API instead of a list of items
 
-            if data.get("attributes.status") in ["errored", "finished"]:
+            now = time.monotonic()
+            status = data.get("attributes.status")
+
+            # Time elapsed since the previous poll is attributed to the status observed back then
+            if previous_status is not None:
+                durations[previous_status] = durations.get(previous_status, 0) + now - polled_at
+            polled_at = now
+
+            if status != previous_status:
+                interval = min_interval
+                previous_status = status
+                status_changed_at = now
+
+            if status in PLAN_COMPLETED_STATUSES:
                 break
-            elif data.get("attributes.status") in ["canceled", "unreachable"]:  # noqa: RET508
-                logging.warning(f"Plan '{id_}' has status '{data.get('attributes.status')}'. Ignoring.")
-                data = {}
+
+            if status in PLAN_FINAL_STATUSES:
+                logging.warning(f"Plan '{id_}' has status '{status}'. Ignoring.")
+                break
+
+            status_timeout = status_timeouts.get(status)
+            if status_timeout is not None and now - status_changed_at >= status_timeout:
+                logging.warning(f"Plan '{id_}' has been '{status}' for more than {status_timeout} seconds. Ignoring.")
+                break
+
+            if now >= deadline:
+                logging.warning(f"Plan '{id_}' did not complete within {deadline - started_at:.0f} seconds. Ignoring.")
                 break
-            else:
-                logging.debug(f"Plan '{id_}' is not finished yet. Waiting 3 seconds before retrying.")
-                time.sleep(3)
+
+            delay = min(interval, deadline - now)
+            logging.debug(f"Plan '{id_}' is '{status}'. Waiting {delay:.1f} seconds before retrying.")
+            time.sleep(delay)
+            interval = min(interval * 2, max_interval)
+
+        queue_wait = sum(duration for status, duration in durations.items() if status in PLAN_QUEUED_STATUSES)
+        logging.info(
+            f"Plan '{id_}' waited {queue_wait:.1f} seconds in queue and ran for "
+            f"{durations.get('running', 0):.1f} seconds ({time.monotonic() - started_at:.1f} seconds in total)"
+        )
 
         return data
 
+    def _get_state_files_manifest_path(self) -> Path:
+        return Path(get_tmp_folder(), "state-files-manifest.jsonl")
+
+    def _get_transport(self) -> Transport:
+        if self._transport is None:
+            cache = None
+            cache_ttl = float(self._config.get("cache_ttl", 0))
+            if cache_ttl > 0 or self._is_offline():
+                cache = ResponseCache(
+                    folder=get_tmp_subfolder("cache"),
+                    max_size=int(float(self._config.get("cache_max_size", 256)) * 1024 * 1024),
+                    ttl=cache_ttl,
+                )
+
+            self._transport = Transport(
+                cache=cache,
+                headers={
+                    "Authorization": f"Bearer {self._config.get('api_token')}",
+                    "Content-Type": "application/vnd.api+json",
+                },
+                max_retries=self._config.get("max_retries", 5),
+                offline=self._is_offline(),
+                pool_size=self._config.get("pool_size", max(DEFAULT_POOL_SIZE, self._get_concurrency())),
+                rate_limit=self._config.get("rate_limit", 30),
+            )
+
+        return self._transport
+
+    def _harvest_workspace_variables(self, agent_pool_id: str, workspace: dict, variables: list[dict]) -> None:
+        """Retrieve the sensitive variable values of a workspace by running a plan on a local agent
+
+        The workspace is temporarily switched to the agent pool, and its execution mode is always restored, even if
+        the plan fails or the export is interrupted. A run that did not complete in time is canceled beforehand, so
+        that it does not run once the workspace is restored.
+
+        Args:
+            agent_pool_id (str): ID of the agent pool the local agents are registered to
+            workspace (dict): Workspace
+            variables (list[dict]): Workspace sensitive variables
+        """
+        organization_id = workspace.get("relationships.organization.data.id")
+        workspace_id = workspace.get("id")
+
+        if workspace.get("relationships.current-configuration-version.data.id") is None:
+            logging.warning(f"Workspace '{organization_id}/{workspace_id}' has no current configuration. Ignoring.")
+            return
+
+        logging.info(f"Backing up the '{organization_id}/{workspace_id}' workspace execution mode")
+        workspace_data_backup = self._extract_data_from_api(
+            cache=False,
+            path=f"/workspaces/{workspace_id}",
+            properties=[
+                "attributes.execution-mode",
+                "attributes.setting-overwrites",
+                "relationships.agent-pool",
+            ],
+        )[
+            0
+        ]  # KLUDGE: There should be a way to pull single item from the API instead of a list of items
+
+        try:
+            logging.info(f"Updating the '{organization_id}/{workspace_id}' workspace to use the TFC Agent")
+            self._extract_data_from_api(
+                method="PATCH",
+                path=f"/workspaces/{workspace_id}",
+                request_data={
+                    "data": {
+                        "attributes": {
+                            "agent-pool-id": agent_pool_id,
+                            "execution-mode": "agent",
+                            "setting-overwrites": {"execution-mode": True, "agent-pool": True},
+                        },
+                        "type": "workspaces",
+                    }
+                },
+            )
+
+            logging.info(f"Trigger a plan for the '{organization_id}/{workspace_id}' workspace")
+            run_data = self._extract_data_from_api(
+                method="POST",
+                path="/runs",
+                properties=["id", "relationships.plan.data.id"],
+                request_data={
+                    "data": {
+                        "attributes": {
+                            "allow-empty-apply": False,
+                            "plan-only": True,
+                            "refresh": False,  # No need to waste time refreshing the state
+                        },
+                        "relationships": {
+                            "workspace": {"data": {"id": workspace_id, "type": "workspaces"}},
+                        },
+                        "type": "runs",
+                    }
+                },
+            )[
+                0
+            ]  # KLUDGE: There should be a way to pull single item from the API instead of a list of items
+
+            logging.info(f"Retrieve the output for the '{organization_id}/{workspace_id}' workspace plan")
+            plan_id = run_data.get("relationships.plan.data.id")
+            plan_data = self._get_plan(id_=plan_id)
+            if plan_data.get("attributes.status") not in PLAN_FINAL_STATUSES:
+                self._cancel_run(id_=run_data.get("id"))
+        finally:
+            self._restore_workspace_execution_mode(workspace=workspace, backup=workspace_data_backup)
+
+        log_read_url = plan_data.get("attributes.log-read-url")
+        if plan_data.get("attributes.status") not in PLAN_COMPLETED_STATUSES or not log_read_url:
+            return
+
+        logging.info(f"Extract the env var values from the '{organization_id}/{workspace_id}' workspace plan output")
+        names = [variable.get("attributes.key") for variable in variables]
+        names.append("ATLAS_CONFIGURATION_VERSION_GITHUB_BRANCH")
+        env_vars = parse_env_vars(iter_lines(self._stream_text_file(url=log_read_url)), names=set(names))
+
+        # Only keep the values that are needed, as the whole environment might have been printed
+        env_vars = {name: env_vars[name] for name in names if name in env_vars}
+
+        self._set_workspace_variable_values(workspace=workspace, variables=variables, env_vars=env_vars)
+        self._get_journal("workspace_variable_values").record(workspace_id, env_vars)
+
+    def _is_offline(self) -> bool:
+        return self._config.get("offline", False)
+
+    def _is_valid_env_var_name(self, name: str) -> bool:
+        return ENV_VAR_NAME_PATTERN.search(name) is not None
+
+    def _load_state_files_manifest(self) -> dict:
+        manifest = {}
+
+        path = self._get_state_files_manifest_path()
+        if not path.exists():
+            return manifest
+
+        with path.open("r", encoding="utf-8") as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                    # Later entries override earlier ones
+                    manifest[entry["workspace_id"]] = entry
+                except (json.JSONDecodeError, KeyError, TypeError):  # noqa: PERF203
+                    # Most likely a line partially written when a previous export was interrupted
+                    logging.debug(f"Ignoring invalid state files manifest line: {line!r}")
+
+        return manifest
+
+    def _get_workspace_variable_groups(self, src_data: dict) -> dict:
+        """Group workspace variables by workspace and sensitivity, checking each variable name only once
+
+        Args:
+            src_data (dict): Source provider data
+
+        Returns:
+            dict: "valid_names" maps variable IDs to whether their name is a valid environment variable name, and
+                "invalid_names" maps workspace IDs to the "plain" and "secret" variables with an invalid name
+        """
+        groups = {"invalid_names": {}, "valid_names": {}}
+        for variable in src_data.get("workspace_variables"):
+            is_name_valid = self._is_valid_env_var_name(variable.get("attributes.key"))
+            groups["valid_names"][variable.get("id")] = is_name_valid
+
+            if is_name_valid:
+                continue
+
+            workspace_groups = groups["invalid_names"].setdefault(
+                variable.get("relationships.workspace.data.id"), {"plain": [], "secret": []}
+            )
+
+            # Variables with an unknown sensitivity are considered both plain and secret
+            if variable.get("attributes.sensitive") is not True:
+                workspace_groups["plain"].append(variable)
+
+            if variable.get("attributes.sensitive") is not False:
+                workspace_groups["secret"].append(variable)
+
+        return groups
+
+    def _map_concurrently(self, function: Callable, items: list, concurrency: int | None = None) -> list:
+        """Apply a function to every item using the configured number of worker threads
+
+        Args:
+            function (Callable): Function to apply, called with a single item
+            items (list): Items to process
+            concurrency (int | None, optional): Number of worker threads. Defaults to the "concurrency" setting.
+
+        Returns:
+            list: Function results, in the same order as the items
+        """
+        if concurrency is None:
+            concurrency = self._get_concurrency()
+
+        if concurrency == 1 or len(items) <= 1:
+            return [function(item) for item in items]
+
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="smk")
+        try:
+            return list(executor.map(function, items))
+        finally:
+            # Do not start pending work if one of the calls failed
+            executor.shutdown(cancel_futures=True)
+
     def _map_modules_data(self, src_data: dict) -> dict:
         logging.info("Start mapping modules data")
 
@@ -961,27 +1418,23 @@ class TerraformExporter(BaseExporter):
 
         return data
 
-    def _map_stack_variables_data(self, src_data: dict) -> dict:
-        def find_workspace(data: dict, workspace_id: str) -> dict:
-            for workspace in data.get("workspaces"):
-                if workspace.get("id") == workspace_id:
-                    return workspace
+    def _map_stack_variables_data(self, src_data: dict, variable_groups: dict) -> dict:
+        def find_workspace(workspace_id: str) -> dict:
+            workspace = workspaces_index.find(workspace_id)
+            if workspace is None:
+                logging.warning(f"Could not find workspace '{workspace_id}'")
 
-            logging.warning(f"Could not find workspace '{workspace_id}'")
-
-            return None
+            return workspace
 
         logging.info("Start mapping stack variables data")
 
-        prog = re.compile("^[a-zA-Z_]+[a-zA-Z0-9_]*$")
+        workspaces_index = EntityIndex(src_data.get("workspaces"))
+
+        valid_names = variable_groups["valid_names"]
         data = []
         for variable in src_data.get("workspace_variables"):
-            workspace = find_workspace(data=src_data, workspace_id=variable.get("relationships.workspace.data.id"))
-
-            is_name_valid = True
-
-            if re.search(prog, variable.get("attributes.key")) is None:
-                is_name_valid = False
+            workspace = find_workspace(variable.get("relationships.workspace.data.id"))
+            is_name_valid = valid_names[variable.get("id")]
 
             data.append(
                 {
@@ -1004,36 +1457,15 @@ class TerraformExporter(BaseExporter):
 
         return data
 
-    def _map_stacks_data(self, src_data: dict) -> dict:
-        def find_workspace_variable_with_invalid_name(data: dict, workspace_id: str, type_: str = "plain") -> dict:
-            prog = re.compile("^[a-zA-Z_]+[a-zA-Z0-9_]*$")
-            variables = []
-
-            for variable in data.get("workspace_variables"):
-                if (variable.get("attributes.sensitive") is True and type_ == "plain") or (
-                    variable.get("attributes.sensitive") is False and type_ == "secret"
-                ):
-                    continue
-
-                if (
-                    variable.get("relationships.workspace.data.id") == workspace_id
-                    and re.search(prog, variable.get("attributes.key")) is None
-                ):
-                    variables.append(variable)
-                    continue
-
-            return variables
-
+    def _map_stacks_data(self, src_data: dict, variable_groups: dict) -> dict:
         logging.info("Start mapping stacks data")
 
+        invalid_names = variable_groups["invalid_names"]
         data = []
         for workspace in src_data.get("workspaces"):
-            variables_with_invalid_name = find_workspace_variable_with_invalid_name(
-                data=src_data, type_="plain", workspace_id=workspace.get("id")
-            )
-            secret_variables_with_invalid_name = find_workspace_variable_with_invalid_name(
-                data=src_data, type_="secret", workspace_id=workspace.get("id")
-            )
+            workspace_invalid_names = invalid_names.get(workspace.get("id"), {})
+            variables_with_invalid_name = workspace_invalid_names.get("plain", [])
+            secret_variables_with_invalid_name = workspace_invalid_names.get("secret", [])
 
             provider = workspace.get("attributes.vcs-repo.service-provider")
             if provider is None:
@@ -1085,12 +1517,14 @@ class TerraformExporter(BaseExporter):
     def _map_data(self, src_data: dict) -> dict:
         logging.info("Start mapping data")
 
-        data = benedict(
+        variable_groups = self._get_workspace_variable_groups(src_data)
+        data = Record.from_data(
             {
                 "spaces": self._map_spaces_data(src_data),  # KLUDGE: Must be first due to dependency
                 "modules": self._map_modules_data(src_data),
-                "stacks": self._map_stacks_data(src_data),
-                "stack_variables": self._map_stack_variables_data(src_data),  # Must be after stacks due to dependency
+                "stacks": self._map_stacks_data(src_data, variable_groups=variable_groups),
+                # Must be after stacks due to dependency
+                "stack_variables": self._map_stack_variables_data(src_data, variable_groups=variable_groups),
             }
         )
 
@@ -1100,19 +1534,126 @@ class TerraformExporter(BaseExporter):
 
         return data
 
-    def _start_agent_container(self, agent_pool_id: str, container_name: str) -> Container:
+    def _normalize_state_file(self, path: Path) -> None:
+        # The Terraform API serves state files as they were uploaded, which usually means with "<", ">" and "&"
+        # escaped as unicode sequences. Re-serializing the file decodes them and pretty-prints the content, at the cost
+        # of loading the whole state in memory.
+        with path.open("r", encoding="utf-8") as fp:
+            content = json.load(fp)
+
+        with path.open("w", encoding="utf-8") as fp:
+            json.dump(content, fp, indent=2)
+
+    def _read_state_file_lineage(self, path: Path) -> str | None:
+        # The lineage is one of the first properties of a state file, so there is no need to parse the whole file
+        with path.open("r", encoding="utf-8", errors="replace") as fp:
+            match = re.search(r'"lineage"\s*:\s*"([^"]*)"', fp.read(64 * 1024))
+
+        return match.group(1) if match else None
+
+    def _restore_workspace_execution_mode(self, workspace: dict, backup: dict) -> None:
+        organization_id = workspace.get("relationships.organization.data.id")
+        workspace_id = workspace.get("id")
+
+        logging.info(f"Restoring the '{organization_id}/{workspace_id}' workspace execution mode")
+        try:
+            self._extract_data_from_api(
+                method="PATCH",
+                path=f"/workspaces/{workspace_id}",
+                request_data={
+                    "data": {
+                        "attributes": {
+                            "execution-mode": backup.get("attributes.execution-mode"),
+                            "setting-overwrites": backup.get("attributes.setting-overwrites"),
+                        },
+                        "relationships": {
+                            "agent-pool": backup.get("relationships.agent-pool"),
+                        },
+                        "type": "workspaces",
+                    }
+                },
+            )
+        except Exception:
+            logging.exception(
+                f"Could not restore the '{organization_id}/{workspace_id}' workspace execution mode. "
+                f"Restore it manually to: {json.dumps(dict(backup))}"
+            )
+            raise
+
+    def _save_state_files_manifest(self, manifest: dict) -> None:
+        with open_atomically(self._get_state_files_manifest_path()) as fp:
+            for _, entry in sorted(manifest.items()):
+                fp.write(f"{json.dumps(entry, sort_keys=True)}\n")
+
+    def _set_workspace_variable_values(self, workspace: dict, variables: list[dict], env_vars: dict) -> None:
+        for variable in variables:
+            value = env_vars.get(variable.get("attributes.key"))
+            if value is None:
+                continue
+
+            masked_value = "*" * len(value)
+            logging.debug(f"Found sensitive env var: '{variable.get('attributes.key')}={masked_value}'")
+
+            variable["attributes.value"] = value
+
+        # KLUDGE: Ideally this should be retrieved independently for more clarity, and only if needed.
+        branch_name = env_vars.get("ATLAS_CONFIGURATION_VERSION_GITHUB_BRANCH")
+        if branch_name is not None and not workspace.get("attributes.vcs-repo.branch"):
+            workspace["attributes.vcs-repo.branch"] = branch_name
+
+    def _start_agent_container(
+        self, agent_pool_id: str, container_name: str, variable_names: list[str] | None = None
+    ) -> Container:
+        image = self._config.get("agent_image", "jmfontaine/tfc-agent:smk-latest")
+        keep_agents = self._config.get("keep_agents", False)
+
+        # The image is pulled once per export, not for every container
+        if not self._agent_image_pulled:
+            logging.info(f"Pulling TFC/TFE agent Docker image '{image}'")
+            docker.image.pull(image, quiet=True)
+            self._agent_image_pulled = True
+
+        # Containers are identified by what cannot be changed once they are created
+        fingerprint = hashlib.sha256(
+            json.dumps([agent_pool_id, image, variable_names or []]).encode("utf-8")
+        ).hexdigest()
+
+        if docker.container.exists(container_name):
+            container = docker.container.inspect(container_name)
+            # Containers without a fingerprint were not started by the exporter (e.g. started by hand) and are kept
+            container_fingerprint = (container.config.labels or {}).get("smk.fingerprint")
+            if container_fingerprint is None or container_fingerprint == fingerprint:
+                if not container.state.running:
+                    container.start()
+
+                logging.debug(
+                    f"Reusing TFC/TFE agent Docker container '{container.id}' from image '{container.config.image}'"
+                )
+
+                return container
+
+            logging.info(f"Replacing outdated TFC/TFE agent Docker container '{container_name}'")
+            container.remove(force=True)
+
         token = self._create_agent_token(agent_pool_id=agent_pool_id)
 
+        envs = {
+            "TFC_AGENT_NAME": "SMK-Agent",
+            "TFC_AGENT_TOKEN": token,
+        }
+
+        # Only print the listed variables in the plan logs, instead of the whole environment
+        if variable_names:
+            envs["SMK_EXPORT_VARIABLE_NAMES"] = ",".join(variable_names)
+
         container = docker.run(
             detach=True,
-            envs={
-                "TFC_AGENT_NAME": "SMK-Agent",
-                "TFC_AGENT_TOKEN": token,
-            },
-            image=self._config.get("agent_image", "jmfontaine/tfc-agent:smk-latest"),
+            envs=envs,
+            image=image,
+            labels={"smk.fingerprint": fingerprint},
             name=container_name,
-            pull="always",
-            remove=True,
+            pull="never",
+            remove=not keep_agents,
         )
 
         logging.debug(f"Using TFC/TFE agent Docker container '{container.id}' from image '{container.config.image}'")
@@ -1123,5 +1664,39 @@ class TerraformExporter(BaseExporter):
         if not container.exists() or not container.state.running:
             logging.warning(f"Local TFC/TFE agent '{container}' is already stopped before trying to stop it. Ignoring.")
 
+        # Containers kept by a previous export are not removed automatically when stopped. Containers the exporter did
+        # not start itself (i.e. without a fingerprint) are only stopped.
+        remove = (
+            not self._config.get("keep_agents", False)
+            and not container.host_config.auto_remove
+            and (container.config.labels or {}).get("smk.fingerprint") is not None
+        )
+
         logging.debug(f"Stopping TFC/TFE agent Docker container '{container.id}' from image '{container.config.image}'")
         container.stop()
+
+        if remove:
+            container.remove(force=True)
+
+    def _stream_text_file(self, url: str) -> Iterator[str]:
+        """Download a text file in chunks, without holding its content in memory
+
+        The download is aborted as soon as the caller stops iterating.
+
+        Args:
+            url (str): URL of the file
+
+        Yields:
+            str: Decoded chunks of the file content
+        """
+        try:
+            # Plan logs contain secret values, so their content is never traced
+            with self._get_transport().request(allow_redirects=True, method="GET", stream=True, url=url) as response:
+                response.raise_for_status()
+                # Plan logs are UTF-8 encoded, but usually served without a charset
+                if "charset" not in response.headers.get("Content-Type", ""):
+                    response.encoding = "utf-8"
+
+                yield from response.iter_content(chunk_size=64 * 1024, decode_unicode=True)
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Error downloading {url}") from e
@@ -6,7 +6,7 @@ from pathlib import Path
 from typing import Optional
 
 import click
-from jinja2 import ChoiceLoader, Environment, FileSystemLoader, nodes
+from jinja2 import ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, nodes
 from jinja2.exceptions import TemplateNotFound, TemplateRuntimeError
 from jinja2.ext import Extension
 
@@ -27,6 +27,9 @@ class RaiseExtension(Extension):
 
 
 class Generator:
+    def __init__(self):
+        self._environment = None
+
     def _check_requirements(self) -> None:
         """Check if the exporter requirements are met"""
         logging.info("Start checking requirements")
@@ -66,31 +69,37 @@ class Generator:
         if extra_vars:
             data["extra_vars"] = extra_vars
 
-        current_file_path = Path(__file__).parent.resolve()
-
-        env = Environment(
-            autoescape=False,
-            extensions=[RaiseExtension],
-            loader=ChoiceLoader(
-                [
-                    FileSystemLoader(Path(f"{current_file_path}/../custom/templates").resolve()),
-                    FileSystemLoader(Path(f"{current_file_path}/templates").resolve()),
-                ]
-            ),
-            lstrip_blocks=True,
-            trim_blocks=True,
-        )
-        env.filters["normalizepath"] = self._filter_normalizepath
-        env.filters["randomsuffix"] = self._filter_randomsuffix
-        env.filters["totf"] = self._filter_totf
-
         try:
-            content = env.get_template(name=template_name, parent="base.tf.jinja").render(**data)
+            content = self._get_environment().get_template(name=template_name, parent="base.tf.jinja").render(**data)
         except TemplateNotFound as e:
             raise FileNotFoundError(f"Template not found '{e.message}'") from e
 
         self._save_to_file("main.tf", content)
 
+    def _get_environment(self) -> Environment:
+        if self._environment is None:
+            current_file_path = Path(__file__).parent.resolve()
+
+            # Compiled templates are kept in tmp/templates-cache and only compiled again when their source changes
+            self._environment = Environment(
+                autoescape=False,
+                bytecode_cache=FileSystemBytecodeCache(get_tmp_subfolder("templates-cache")),
+                extensions=[RaiseExtension],
+                loader=ChoiceLoader(
+                    [
+                        FileSystemLoader(Path(f"{current_file_path}/../custom/templates").resolve()),
+                        FileSystemLoader(Path(f"{current_file_path}/templates").resolve()),
+                    ]
+                ),
+                lstrip_blocks=True,
+                trim_blocks=True,
+            )
+            self._environment.filters["normalizepath"] = self._filter_normalizepath
+            self._environment.filters["randomsuffix"] = self._filter_randomsuffix
+            self._environment.filters["totf"] = self._filter_totf
+
+        return self._environment
+
     def _load_data(self) -> dict:
         return load_normalized_data()
 
@@ -0,0 +1,74 @@
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any
+
+
+class Journal:
+    """Progress journal of a long running export stage
+
+    Each processed entity is recorded as a JSON line appended to the journal file as soon as it is done, so that the
+    work performed before an interruption can be skipped when the export is resumed.
+    """
+
+    def __init__(self, path: Path | None):
+        """Constructor
+
+        Args:
+            path (Path | None): Path of the journal file. Entries it already contains are loaded. If None, entries are
+                only kept in memory.
+        """
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._path = path
+
+        if path and path.exists():
+            line = ""
+            with path.open("r", encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry["value"]
+                    except (json.JSONDecodeError, KeyError, TypeError):  # noqa: PERF203
+                        # Most likely a line partially written when the export was interrupted
+                        logging.debug(f"Ignoring invalid '{path.name}' journal line: {line!r}")
+
+            # End the line partially written when the export was interrupted, as new entries would be appended to it
+            if line and not line.endswith("\n"):
+                with path.open("a", encoding="utf-8") as fp:
+                    fp.write("\n")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get the value recorded for an entity
+
+        Args:
+            key (str): Entity key, usually its ID
+            default (Any, optional): Value returned if nothing was recorded. Defaults to None.
+
+        Returns:
+            Any: Recorded value
+        """
+        return self._entries.get(key, default)
+
+    def record(self, key: str, value: Any) -> None:
+        """Record the result of processing an entity
+
+        Args:
+            key (str): Entity key, usually its ID
+            value (Any): JSON serializable result
+        """
+        with self._lock:
+            self._entries[key] = value
+            if self._path is None:
+                return
+
+            line = json.dumps({"key": key, "value": value}, sort_keys=True)
+            with self._path.open("a", encoding="utf-8") as fp:
+                fp.write(f"{line}\n")
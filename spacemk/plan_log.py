@@ -0,0 +1,111 @@
+import base64
+import json
+import re
+from collections.abc import Collection, Iterable, Iterator
+
+# Printed by the data/terraform-agent/terraform-pre-plan hook around the exported environment variables
+EXPORT_END_MARKER = "===================== SMK EXPORT ===================>"
+EXPORT_JSON_END_MARKER = "=================== SMK EXPORT JSON =================>"
+EXPORT_JSON_START_MARKER = "<================== SMK EXPORT JSON ==================="
+EXPORT_START_MARKER = "<==================== SMK EXPORT ===================="
+
+# env prints any variable name, including names that are not valid shell identifiers (e.g. "my-token")
+ENV_VAR_LINE_PATTERN = re.compile(r"([^=\s]+)=")
+IDENTIFIER_PATTERN = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*")
+
+
+def _match_env_var_name(line: str, names: Collection[str] | None) -> str | None:
+    match = ENV_VAR_LINE_PATTERN.match(line)
+    if match is None:
+        return None
+
+    name = match.group(1)
+    if names is not None and name not in names and not IDENTIFIER_PATTERN.fullmatch(name):
+        return None
+
+    return name
+
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Split a stream of text chunks into lines
+
+    Unlike str.splitlines(), only "\\n" is considered a line break, so that values containing other line boundary
+    characters are kept intact.
+
+    Args:
+        chunks (Iterable[str]): Text chunks
+
+    Yields:
+        str: Lines, without the trailing line break
+    """
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        yield from lines
+
+    if pending:
+        yield pending
+
+
+def parse_env_vars(lines: Iterable[str], names: Collection[str] | None = None) -> dict[str, str]:
+    """Extract the environment variables printed in a plan log
+
+    When the agent was given the names of the variables to export, the hook prints them as a JSON document with
+    base64-encoded values between the SMK EXPORT JSON markers, and reading stops right after it.
+
+    Otherwise, the hook prints its whole environment. Only the lines between the SMK EXPORT markers are considered,
+    and reading stops at the end marker. Lines not starting with a variable name are continuation lines of multi-line
+    values. Logs from agents without the markers are scanned entirely, but then multi-line values cannot be told apart
+    from the rest of the log and only their first line is kept.
+
+    Args:
+        lines (Iterable[str]): Plan log lines
+        names (Collection[str], optional): Names of the needed variables. If set, lines starting with something else
+            than one of these names or a shell identifier followed by "=" (e.g. base64 padding) are considered
+            continuation lines. Defaults to None.
+
+    Returns:
+        dict[str, str]: Environment variable values, by name
+    """
+    env_vars = {}
+    unmarked_env_vars = {}
+    in_export_block = False
+    in_json_block = False
+    name = None
+
+    for line in lines:
+        marker = line.rstrip("\r")
+        if marker == EXPORT_JSON_START_MARKER:
+            in_json_block = True
+            continue
+
+        if in_json_block:
+            try:
+                return {key: base64.b64decode(value).decode() for key, value in json.loads(line).items()}
+            except (AttributeError, ValueError):
+                # Most likely a truncated log. Fall back to any other output.
+                in_json_block = False
+                continue
+
+        if marker == EXPORT_START_MARKER:
+            in_export_block = True
+            continue
+
+        if marker == EXPORT_END_MARKER:
+            if in_export_block:
+                return env_vars
+
+            continue
+
+        line_name = _match_env_var_name(line, names)
+        if in_export_block:
+            if line_name is not None:
+                name = line_name
+                env_vars[name] = line[len(name) + 1 :]
+            elif name is not None:
+                env_vars[name] += f"\n{line}"
+        elif line_name is not None:
+            unmarked_env_vars[line_name] = line[len(line_name) + 1 :]
+
+    return env_vars if in_export_block else unmarked_env_vars
@@ -0,0 +1,163 @@
+from collections.abc import Callable, Iterable, Mapping
+from functools import lru_cache
+from typing import Any
+
+KEYPATH_SEPARATOR = "."
+
+
+@lru_cache(maxsize=1024)
+def _split_keypath(keypath: str) -> tuple[str, ...]:
+    return tuple(keypath.split(KEYPATH_SEPARATOR))
+
+
+class Record(dict):
+    """Dictionary with keypath access to nested values
+
+    A lightweight replacement for benedict in the data processing hot paths. Reading a keypath (e.g.
+    "attributes.vcs-repo.identifier") walks nested dictionaries directly, with the keypath split only once per process,
+    and nested dictionaries are not wrapped or converted when they are accessed. Records are plain dictionaries
+    otherwise, so they are JSON serializable and can be used in templates as is.
+    """
+
+    __slots__ = ()
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if not isinstance(key, str) or KEYPATH_SEPARATOR not in key:
+            super().__setitem__(key, value)
+            return
+
+        *parent_keys, last_key = _split_keypath(key)
+        parent = self
+        for parent_key in parent_keys:
+            child = dict.get(parent, parent_key)
+            if not isinstance(child, dict):
+                child = Record()
+                dict.__setitem__(parent, parent_key, child)
+            parent = child
+
+        dict.__setitem__(parent, last_key, value)
+
+    @classmethod
+    def from_data(cls, data: Any) -> Any:
+        """Convert all the dictionaries nested in some data to records
+
+        Args:
+            data (Any): Data, usually loaded from JSON
+
+        Returns:
+            Any: Data, with records instead of dictionaries
+        """
+        if isinstance(data, dict):
+            return cls({key: cls.from_data(value) for key, value in data.items()})
+
+        if isinstance(data, list):
+            return [cls.from_data(item) for item in data]
+
+        return data
+
+    def clone(self) -> "Record":
+        """Copy the record, and the dictionaries and lists nested in it
+
+        Returns:
+            Record: Copy of the record
+        """
+        return Record.from_data(self)
+
+    def flatten(self, separator: str = KEYPATH_SEPARATOR) -> dict:
+        """Flatten nested dictionaries into a single level dictionary
+
+        Args:
+            separator (str, optional): Separator used to join the keys. Defaults to ".".
+
+        Returns:
+            dict: Values, by keypath
+        """
+        return flatten(self, separator=separator)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a value by key or keypath
+
+        Args:
+            key (str): Key, or keypath of a nested value (e.g. "attributes.name")
+            default (Any, optional): Value returned if there is none. Defaults to None.
+
+        Returns:
+            Any: Value
+        """
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+
+        if not isinstance(key, str) or KEYPATH_SEPARATOR not in key:
+            return default
+
+        value = self
+        for key_ in _split_keypath(key):
+            if not isinstance(value, dict) or key_ not in value:
+                return default
+
+            value = dict.__getitem__(value, key_)
+
+        return value
+
+
+def compile_projection(properties: Iterable[str]) -> Callable[[Mapping], Record]:
+    """Compile a function extracting given properties from some data
+
+    The function builds the nested record in a single pass over the properties, without parsing keypaths. Properties
+    missing from the data are set to None, as if each one was copied with `record[keypath] = data.get(keypath)`.
+    Compiled functions are cached by property list.
+
+    Args:
+        properties (Iterable[str]): Keypaths of the properties to extract (e.g. ["attributes.name", "id"])
+
+    Returns:
+        Callable[[Mapping], Record]: Function extracting the properties from some data
+    """
+    return _compile_projection(tuple(properties))
+
+
+@lru_cache(maxsize=256)
+def _compile_projection(properties: tuple[str, ...]) -> Callable[[Mapping], Record]:
+    # Tree of the keys to extract, where leaves are None
+    tree = {}
+    for property_ in properties:
+        *parent_keys, last_key = _split_keypath(property_)
+        node = tree
+        for key in parent_keys:
+            if key in node and node[key] is None:  # A parent property is extracted as a whole already
+                break
+
+            node = node.setdefault(key, {})
+        else:
+            node[last_key] = None
+
+    def project(node: dict, data: Any) -> Record:
+        if not isinstance(data, Mapping):
+            data = {}
+
+        return Record(
+            {key: data.get(key) if child is None else project(child, data.get(key)) for key, child in node.items()}
+        )
+
+    return lambda data: project(tree, data)
+
+
+def flatten(data: Mapping, separator: str = KEYPATH_SEPARATOR) -> dict:
+    """Flatten nested dictionaries into a single level dictionary
+
+    Args:
+        data (Mapping): Data, with nested dictionaries
+        separator (str, optional): Separator used to join the keys. Defaults to ".".
+
+    Returns:
+        dict: Values, by keypath (e.g. {"attributes.name": "example"})
+    """
+    flat_data = {}
+    for key, value in data.items():
+        if isinstance(value, Mapping):
+            for nested_key, nested_value in flatten(value, separator=separator).items():
+                flat_data[f"{key}{separator}{nested_key}"] = nested_value
+        else:
+            flat_data[key] = value
+
+    return flat_data
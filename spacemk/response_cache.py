@@ -0,0 +1,168 @@
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from spacemk import open_atomically
+
+# Only the headers needed to use and revalidate cached responses are stored
+CACHED_HEADERS = ["Content-Type", "ETag"]
+
+
+class ResponseCache:
+    """Persistent cache of HTTP responses, stored as one file per entry
+
+    Entries are fresh for a limited time. Expired entries with an ETag can be revalidated with a conditional request
+    instead of being downloaded again. The least recently used entries are evicted once the cache grows larger than
+    its maximum size. Entries are only listed from disk when the cache is created, and tracked in memory afterwards.
+    """
+
+    def __init__(self, folder: Path, ttl: float, max_size: int):
+        """Constructor
+
+        Args:
+            folder (Path): Folder where entries are stored
+            ttl (float): Number of seconds during which entries are served without calling the API
+            max_size (int): Maximum size of the cache, in bytes
+        """
+        self._folder = folder
+        self._lock = threading.Lock()
+        self._max_size = max_size
+        self._ttl = ttl
+
+        # Size of each entry, by key, least recently used first. The modification time of an entry is updated every
+        # time it is used, so that the order is kept across exports.
+        self._entries = OrderedDict()
+        stats = [(path.stat(), path) for path in folder.glob("*.json")]
+        for stat, path in sorted(stats, key=lambda item: item[0].st_mtime):
+            self._entries[path.stem] = stat.st_size
+        self._size = sum(self._entries.values())
+
+    def _evict(self) -> None:
+        while self._size > self._max_size and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._get_path(key).unlink(missing_ok=True)
+            self._size -= size
+            logging.debug(f"Evicted '{key}' response cache entry")
+
+    def _get_path(self, key: str) -> Path:
+        return Path(self._folder, f"{key}.json")
+
+    def _write(self, key: str, entry: dict) -> None:
+        # Entries are ASCII only, so their length is their size on disk
+        content = json.dumps(entry)
+        with open_atomically(self._get_path(key)) as fp:
+            fp.write(content)
+
+        with self._lock:
+            self._size += len(content) - self._entries.pop(key, 0)
+            self._entries[key] = len(content)
+
+            if self._size > self._max_size:
+                self._evict()
+
+    def build_response(self, entry: dict) -> requests.Response:
+        """Build a response from a cache entry
+
+        Args:
+            entry (dict): Cache entry
+
+        Returns:
+            requests.Response: Response
+        """
+        response = requests.Response()
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.raw = io.BytesIO(base64.b64decode(entry["content"]))
+        response.status_code = entry["status_code"]
+        response.url = entry["url"]
+
+        return response
+
+    def get(self, key: str) -> dict | None:
+        """Get an entry, whether it is fresh or not
+
+        Args:
+            key (str): Entry key
+
+        Returns:
+            dict | None: Cache entry, or None if there is none
+        """
+        path = self._get_path(key)
+
+        try:
+            with path.open("r", encoding="utf-8") as fp:
+                entry = json.load(fp)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            logging.debug(f"Ignoring invalid '{path.name}' response cache entry")
+            return None
+
+        # Mark the entry as recently used. It might have been evicted by another thread in the meantime.
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        """Check if an entry can be used without calling the API
+
+        Args:
+            entry (dict): Cache entry
+
+        Returns:
+            bool: True if the entry has not expired yet
+        """
+        return time.time() - entry["stored_at"] < self._ttl
+
+    def refresh(self, key: str, entry: dict) -> None:
+        """Mark an entry as fresh again, after it has been revalidated
+
+        Args:
+            key (str): Entry key
+            entry (dict): Cache entry
+        """
+        self._write(key, {**entry, "stored_at": time.time()})
+
+    def store(self, key: str, response: requests.Response) -> None:
+        """Store a response
+
+        Args:
+            key (str): Entry key
+            response (requests.Response): Response, with its content already loaded
+        """
+        entry = {
+            "content": base64.b64encode(response.content).decode("ascii"),
+            "headers": {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+            "status_code": response.status_code,
+            "stored_at": time.time(),
+            "url": response.url,
+        }
+        self._write(key, entry)
+
+
+def get_cache_key(method: str, url: str, authorization: str | None = None) -> str:
+    """Compute the key of a request in the response cache
+
+    Args:
+        method (str): HTTP method
+        url (str): URL, including the query string
+        authorization (str, optional): Authorization header, so that responses are never shared across credentials
+
+    Returns:
+        str: Cache key
+    """
+    return hashlib.sha256(f"{method.upper()} {url}\n{authorization or ''}".encode()).hexdigest()
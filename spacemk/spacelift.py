@@ -5,9 +5,10 @@ from base64 import b64encode
 
 import requests
 from benedict import benedict
-from requests_toolbelt.utils import dump as request_dump
 
 from spacemk import load_normalized_data
+from spacemk.entity_index import EntityIndex
+from spacemk.transport import trace_response
 
 
 class Spacelift:
@@ -20,14 +21,15 @@ class Spacelift:
         self._config = config
         self._api_jwt_token = None
 
-    def _call_api(self, operation: str, variables: dict | None = None) -> dict:
+    def _call_api(self, operation: str, variables: dict | None = None, sensitive: bool = False) -> dict:
         try:
             response = requests.post(
                 headers={"Authorization": f"Bearer {self._get_api_jwt_token()}"},
                 json={"query": operation, "variables": variables},
                 url=self._config.get("api.api_key_endpoint"),
             )
-            logging.debug(request_dump.dump_all(response).decode("utf-8"))
+            # Do not trace the payload when it contains secret values
+            trace_response(response, include_body=not sensitive)
             response.raise_for_status()
         except requests.exceptions.HTTPError as e:
             raise RuntimeError(f"HTTP Error: {e}") from e
@@ -60,6 +62,7 @@ class Spacelift:
                 json=payload,
                 url=self._config.get("api.api_key_endpoint"),
             )
+            trace_response(response)
             data = benedict(response.json())
 
             if "errors" in data:
@@ -72,7 +75,7 @@ class Spacelift:
     def _get_sensitive_env_vars(self) -> list[dict]:
         env_vars = []
 
-        data = load_normalized_data()
+        data = load_normalized_data(entity_types=["stack_variables"])
         for env_var in data.get("stack_variables"):
             # We only consider sensitive variables here
             if not env_var.get("write_only"):
@@ -116,7 +119,7 @@ class Spacelift:
             },
         }
 
-        response = self._call_api(operation=operation, variables=variables)
+        response = self._call_api(operation=operation, sensitive=True, variables=variables)
 
         if response.get("errors"):
             logging.warning(
@@ -170,20 +173,23 @@ class Spacelift:
 
         return versions
 
+    def _get_stack_variable_index(self) -> EntityIndex:
+        data = load_normalized_data(entity_types=["stack_variables"])
+
+        return EntityIndex(data.get("stack_variables", []))
+
     def _get_stacks_with_invalid_env_var_names(self) -> list:
-        data = load_normalized_data()
+        data = load_normalized_data(entity_types=["stacks"])
 
         return [stack for stack in data.get("stacks") if stack.get("has_variables_with_invalid_name") is True]
 
-    def _get_terraform_var_with_invalid_name_for_stack(self, stack_source_id: str) -> list:
-        data = load_normalized_data()
-
+    def _get_terraform_var_with_invalid_name_for_stack(
+        self, stack_source_id: str, stack_variable_index: EntityIndex
+    ) -> list:
         return [
             var
-            for var in data.get("stack_variables")
-            if var.get("_relationships.stack._source_id") == stack_source_id
-            and var.get("type") == "terraform"
-            and var.get("valid_name") is False
+            for var in stack_variable_index.find_all(stack_source_id, key="_relationships.stack._source_id")
+            if var.get("type") == "terraform" and var.get("valid_name") is False
         ]
 
     def create_module_version(self, commit_sha: str, module: str, version: str):
@@ -214,7 +220,7 @@ class Spacelift:
             },
         }
 
-        response = self._call_api(operation=operation, variables=variables)
+        response = self._call_api(operation=operation, sensitive=write_only, variables=variables)
 
         if response.get("errors"):
             logging.warning(
@@ -234,10 +240,15 @@ class Spacelift:
                 )
 
     def set_terraform_vars_with_invalid_name(self) -> None:
+        # Stack variables are indexed by stack once, instead of being looked up for each stack
+        stack_variable_index = self._get_stack_variable_index()
         for stack in self._get_stacks_with_invalid_env_var_names():
             plain_mounted_file_content = ""
             secret_mounted_file_content = ""
-            for env_var in self._get_terraform_var_with_invalid_name_for_stack(stack_source_id=stack.get("_source_id")):
+            env_vars = self._get_terraform_var_with_invalid_name_for_stack(
+                stack_source_id=stack.get("_source_id"), stack_variable_index=stack_variable_index
+            )
+            for env_var in env_vars:
                 if env_var.get("hcl"):
                     new_line = f"{env_var.get('name')} = {env_var.get('value')}\n"
                 else:
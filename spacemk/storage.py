@@ -0,0 +1,96 @@
+import json
+import logging
+from collections.abc import Iterator
+from pathlib import Path
+
+
+class JsonLinesStorage:
+    """Storage of normalized data as one JSON Lines file per entity type
+
+    Entities are written and read one line at a time, so that saving does not require serializing all the data at once
+    and an entity type can be loaded without parsing the others.
+    """
+
+    def __init__(self, folder: Path):
+        """Constructor
+
+        Args:
+            folder (Path): Folder where the entity type files are stored
+        """
+        self._folder = folder
+
+    def _get_path(self, entity_type: str) -> Path:
+        return Path(self._folder, f"{entity_type}.jsonl")
+
+    def _iter_entities(self, path: Path) -> Iterator[dict]:
+        with path.open("r", encoding="utf-8") as fp:
+            for line in fp:
+                if line.strip():
+                    yield json.loads(line)
+
+    def get_entity_types(self) -> list[str]:
+        """List the stored entity types
+
+        Returns:
+            list[str]: Entity types (e.g. "stacks")
+        """
+        return sorted(path.stem for path in self._folder.glob("*.jsonl"))
+
+    def get_mtime(self) -> float | None:
+        """Get the time the data was last saved
+
+        Returns:
+            float | None: Modification time of the most recently written file, or None if no data is stored
+        """
+        mtimes = [path.stat().st_mtime for path in self._folder.glob("*.jsonl")]
+
+        return max(mtimes) if mtimes else None
+
+    def get_signature(self) -> tuple:
+        """Get a value that changes whenever the stored data is modified
+
+        Returns:
+            tuple: Name, modification time and size of each file
+        """
+        signature = []
+        for path in sorted(self._folder.glob("*.jsonl")):
+            stat = path.stat()
+            signature.append((path.name, stat.st_mtime_ns, stat.st_size))
+
+        return tuple(signature)
+
+    def load(self, entity_type: str) -> list[dict] | None:
+        """Load the entities of a given type
+
+        Args:
+            entity_type (str): Entity type (e.g. "stacks")
+
+        Returns:
+            list[dict] | None: Entities, or None if the entity type is not stored
+        """
+        path = self._get_path(entity_type)
+        if not path.exists():
+            return None
+
+        logging.debug(f"Loading '{entity_type}' normalized data from '{path.name}'")
+
+        return list(self._iter_entities(path))
+
+    def save(self, data: dict) -> None:
+        """Save normalized data, replacing the data previously saved
+
+        Args:
+            data (dict): Entities, by entity type
+        """
+        # Imported here as the spacemk package depends on this module
+        from spacemk import open_atomically
+
+        for entity_type, entities in data.items():
+            with open_atomically(self._get_path(entity_type)) as fp:
+                for entity in entities:
+                    fp.write(json.dumps(entity, sort_keys=True))
+                    fp.write("\n")
+
+        # Remove the entity types that are not part of the data anymore
+        for entity_type in set(self.get_entity_types()) - set(data):
+            self._get_path(entity_type).unlink(missing_ok=True)
@@ -0,0 +1,426 @@
+import logging
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from spacemk.response_cache import ResponseCache, get_cache_key
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TRACE_MAX_BODY_SIZE = 10_000
+
+# Methods that can safely be sent again when the server may or may not have processed the request
+IDEMPOTENT_METHODS = frozenset(["DELETE", "GET", "HEAD", "OPTIONS", "PUT"])
+
+RETRYABLE_STATUS_CODES = frozenset(
+    [
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.BAD_GATEWAY,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    ]
+)
+
+REDACTED = "[REDACTED]"
+SENSITIVE_HEADERS = frozenset(["authorization", "cookie", "proxy-authorization", "set-cookie"])
+# JSON string properties whose value must never be written to the logs (e.g. API tokens)
+SENSITIVE_PROPERTIES_PATTERN = re.compile(
+    r'("(?:apiKeySecret|jwt|password|secret|token)"\s*:\s*)"(?:[^"\\]|\\.)*"', flags=re.IGNORECASE
+)
+
+_trace_logger = logging.getLogger("spacemk.http")
+_trace_max_body_size = DEFAULT_TRACE_MAX_BODY_SIZE
+
+
+class RateLimiter:
+    """Token bucket limiting the rate of requests sent to each host"""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        """Constructor
+
+        Args:
+            rate (float): Maximum number of requests per second per host
+            burst (int, optional): Number of requests that can be sent at once before being throttled.
+                Defaults to the rate.
+        """
+        self._burst = burst if burst is not None else max(1, int(rate))
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._rate = rate
+
+    def _refill(self, host: str, now: float) -> float:
+        tokens, updated_at = self._buckets.get(host, (self._burst, now))
+
+        return min(self._burst, tokens + (now - updated_at) * self._rate)
+
+    def acquire(self, url: str) -> float:
+        """Wait until a request to the URL host is allowed
+
+        Args:
+            url (str): URL about to be requested
+
+        Returns:
+            float: Time spent waiting, in seconds
+        """
+        host = urlparse(url).netloc
+        now = time.monotonic()
+
+        with self._lock:
+            tokens = self._refill(host, now)
+
+            # Take the token right away, even if that makes the balance negative, so that concurrent callers queue up
+            # behind each other instead of all waking up at the same time.
+            delay = 0.0 if tokens >= 1 else (1 - tokens) / self._rate
+            self._buckets[host] = (tokens - 1, now)
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+    def pause(self, url: str, duration: float) -> None:
+        """Hold back all requests to the URL host, e.g. after being told to slow down by the server
+
+        Args:
+            url (str): URL that was throttled
+            duration (float): Minimum time to wait before the next request, in seconds
+        """
+        host = urlparse(url).netloc
+        now = time.monotonic()
+
+        with self._lock:
+            tokens = self._refill(host, now)
+            self._buckets[host] = (min(tokens, 1 - duration * self._rate), now)
+
+
+class RetryStats:
+    """Number of retries and time spent sleeping before retrying, per endpoint"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, delay: float) -> None:
+        with self._lock:
+            retries, sleep_time = self._data.get(endpoint, (0, 0.0))
+            self._data[endpoint] = (retries + 1, sleep_time + delay)
+
+    def items(self) -> list[tuple[str, int, float]]:
+        """List statistics
+
+        Returns:
+            list[tuple[str, int, float]]: Endpoint, number of retries and sleep time, sorted by endpoint
+        """
+        with self._lock:
+            return [(endpoint, retries, sleep_time) for endpoint, (retries, sleep_time) in sorted(self._data.items())]
+
+
+def compute_backoff(attempt: int, base: float, cap: float) -> float:
+    """Compute an exponential backoff delay with full jitter
+
+    Args:
+        attempt (int): Number of attempts already made, starting at 0
+        base (float): Delay for the first retry, in seconds
+        cap (float): Maximum delay, in seconds
+
+    Returns:
+        float: Delay, in seconds
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def get_endpoint_name(method: str, url: str) -> str:
+    """Build an endpoint name suitable for grouping statistics
+
+    Args:
+        method (str): HTTP method
+        url (str): URL
+
+    Returns:
+        str: Method and URL path with entity IDs replaced by a placeholder (e.g. "GET /api/v2/workspaces/{id}/vars")
+    """
+    path = re.sub(r"/[a-z]+-[a-zA-Z0-9]{16}(?=/|$)", "/{id}", urlparse(url).path)
+
+    return f"{method.upper()} {path}"
+
+
+def parse_retry_after(response: requests.Response) -> float | None:
+    """Extract the time to wait before retrying from the response headers
+
+    Both the standard "Retry-After" header (in seconds or as an HTTP date) and the "X-RateLimit-Reset" header
+    sent by Terraform Cloud/Enterprise (in seconds) are supported.
+
+    Args:
+        response (requests.Response): Response
+
+    Returns:
+        float | None: Time to wait, in seconds, or None if the server did not say
+    """
+    value = response.headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            logging.debug(f"Invalid 'Retry-After' header value ({value}). Ignoring.")
+
+    value = response.headers.get("X-RateLimit-Reset")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            logging.debug(f"Invalid 'X-RateLimit-Reset' header value ({value}). Ignoring.")
+
+    return None
+
+
+def _format_trace_body(body: bytes | str | None) -> str:
+    if not body:
+        return ""
+
+    size = len(body)
+    text = body[:_trace_max_body_size]
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", errors="replace")
+
+    text = SENSITIVE_PROPERTIES_PATTERN.sub(rf'\1"{REDACTED}"', text)
+    if size > _trace_max_body_size:
+        text += f"\n[{size - _trace_max_body_size} more bytes truncated]"
+
+    return text
+
+
+def _format_trace_headers(prefix: str, headers: dict) -> list[str]:
+    return [
+        f"{prefix} {name}: {REDACTED if name.lower() in SENSITIVE_HEADERS else value}"
+        for name, value in headers.items()
+    ]
+
+
+def configure_tracing(file_path: str | None = None, max_body_size: int = DEFAULT_TRACE_MAX_BODY_SIZE) -> None:
+    """Configure how HTTP requests and responses are traced
+
+    Traces are logged at the debug level. When a trace file is set, they are written to that file regardless of the
+    verbosity, and no longer sent to the terminal.
+
+    Args:
+        file_path (str, optional): Path to the file traces are written to
+        max_body_size (int, optional): Maximum number of bytes of each request and response body included in traces
+    """
+    global _trace_max_body_size  # noqa: PLW0603
+    _trace_max_body_size = max_body_size
+
+    if file_path:
+        handler = logging.FileHandler(file_path, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s"))
+        _trace_logger.addHandler(handler)
+        _trace_logger.propagate = False
+        _trace_logger.setLevel(logging.DEBUG)
+
+
+def trace_response(response: requests.Response, include_body: bool = True) -> None:
+    """Log an HTTP request and its response, if HTTP tracing is enabled
+
+    Credentials and other sensitive values are redacted, and bodies are truncated.
+
+    Args:
+        response (requests.Response): Response
+        include_body (bool, optional): Whether to include the bodies. Must be False for streamed responses.
+    """
+    if not _trace_logger.isEnabledFor(logging.DEBUG):
+        return
+
+    lines = []
+    for item in [*response.history, response]:
+        request = item.request
+        lines.append(f"> {request.method} {request.url}")
+        lines.extend(_format_trace_headers(">", request.headers))
+        if include_body and request.body:
+            lines.append(_format_trace_body(request.body))
+
+        lines.append(f"< {item.status_code} {item.reason}")
+        lines.extend(_format_trace_headers("<", item.headers))
+        if include_body and item.content:
+            lines.append(_format_trace_body(item.content))
+
+    _trace_logger.debug("\n".join(lines))
+
+
+class Transport:
+    """HTTP client with connection pooling, client-side rate limiting and retries"""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        headers: dict | None = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        rate_limit: float | None = None,
+        max_retries: int = 0,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+        cache: ResponseCache | None = None,
+        offline: bool = False,
+    ):
+        """Constructor
+
+        Args:
+            headers (dict, optional): Headers sent with every request
+            pool_size (int, optional): Maximum number of connections kept open per host
+            rate_limit (float, optional): Maximum number of requests per second per host. Disabled if not set.
+            max_retries (int, optional): Maximum number of times a throttled or failed request is retried
+            backoff_base (float, optional): Delay for the first retry, in seconds
+            backoff_cap (float, optional): Maximum delay between retries, in seconds
+            cache (ResponseCache, optional): Cache for the responses to GET requests. Disabled if not set.
+            offline (bool, optional): Only serve responses from the cache, whatever their age
+        """
+        self._backoff_base = backoff_base
+        self._backoff_cap = backoff_cap
+        self._cache = cache
+        self._max_retries = max_retries
+        self._offline = offline
+        self._rate_limiter = RateLimiter(rate=rate_limit) if rate_limit else None
+        self._session = create_session(headers=headers, pool_size=pool_size)
+        self.retry_stats = RetryStats()
+
+    def _get_retry_delay(self, attempt: int, method: str, url: str, response: requests.Response | None) -> float | None:
+        if attempt >= self._max_retries:
+            return None
+
+        if response is None:  # Connection error or timeout
+            if method.upper() not in IDEMPOTENT_METHODS:
+                return None
+
+            return compute_backoff(attempt, base=self._backoff_base, cap=self._backoff_cap)
+
+        if response.status_code not in RETRYABLE_STATUS_CODES:
+            return None
+
+        # Throttled requests have not been processed and can always be retried
+        if response.status_code != HTTPStatus.TOO_MANY_REQUESTS and method.upper() not in IDEMPOTENT_METHODS:
+            return None
+
+        delay = parse_retry_after(response)
+        if delay is None:
+            delay = compute_backoff(attempt, base=self._backoff_base, cap=self._backoff_cap)
+
+        if response.status_code == HTTPStatus.TOO_MANY_REQUESTS and self._rate_limiter:
+            self._rate_limiter.pause(url, delay)
+
+        return delay
+
+    def _send(self, method: str, url: str, trace_body: bool, **kwargs) -> requests.Response:
+        attempt = 0
+        while True:
+            if self._rate_limiter:
+                self._rate_limiter.acquire(url)
+
+            try:
+                response = self._session.request(method=method, url=url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                delay = self._get_retry_delay(attempt=attempt, method=method, url=url, response=None)
+                if delay is None:
+                    raise
+
+                reason = type(e).__name__
+            else:
+                trace_response(response, include_body=trace_body)
+
+                delay = self._get_retry_delay(attempt=attempt, method=method, url=url, response=response)
+                if delay is None:
+                    return response
+
+                reason = f"HTTP {response.status_code}"
+                response.close()
+
+            logging.debug(f"{reason} for {method} {url}. Retrying in {delay:.1f} seconds.")
+            self.retry_stats.record(endpoint=get_endpoint_name(method, url), delay=delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def log_retry_stats(self) -> None:
+        for endpoint, retries, sleep_time in self.retry_stats.items():
+            logging.info(f"Retried '{endpoint}' {retries} time(s), waiting {sleep_time:.1f} seconds in total")
+
+        # Retries are only reported once, even if an export runs right after an audit
+        self.retry_stats = RetryStats()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request, retrying it if it is throttled or fails temporarily
+
+        Successful responses to GET requests are cached, if a cache is set, unless they are streamed.
+
+        Args:
+            method (str): HTTP method
+            url (str): URL
+            cache (bool, optional): Whether the cache can be used. Must be False for responses that change quickly.
+            trace_body (bool, optional): Whether to include the bodies in HTTP traces. Must be False when streaming.
+            **kwargs: Arguments passed to requests.Session.request
+
+        Returns:
+            requests.Response: Response of the last attempt
+        """
+        use_cache = kwargs.pop("cache", True) and self._cache is not None
+        use_cache = use_cache and method.upper() == "GET" and not kwargs.get("stream", False)
+        trace_body = kwargs.pop("trace_body", not kwargs.get("stream", False))
+
+        if not use_cache:
+            if self._offline:
+                raise requests.exceptions.ConnectionError(f"Cannot send {method} {url} request in offline mode")
+
+            return self._send(method=method, url=url, trace_body=trace_body, **kwargs)
+
+        key = get_cache_key(method, url, authorization=self._session.headers.get("Authorization"))
+        entry = self._cache.get(key)
+        if entry and (self._offline or self._cache.is_fresh(entry)):
+            logging.debug(f"Serving {method} {url} from the response cache")
+            return self._cache.build_response(entry)
+
+        if self._offline:
+            raise requests.exceptions.ConnectionError(f"No cached response for {method} {url} in offline mode")
+
+        # Expired entries are revalidated instead of being downloaded again, when possible
+        if entry and entry["headers"].get("ETag"):
+            kwargs["headers"] = {**kwargs.get("headers", {}), "If-None-Match": entry["headers"]["ETag"]}
+
+        response = self._send(method=method, url=url, trace_body=trace_body, **kwargs)
+        if entry and response.status_code == HTTPStatus.NOT_MODIFIED:
+            logging.debug(f"Revalidated {method} {url} response cache entry")
+            self._cache.refresh(key, entry)
+
+            return self._cache.build_response(entry)
+
+        if response.ok:
+            self._cache.store(key, response)
+
+        return response
+
+
+def create_session(headers: dict | None = None, pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Create an HTTP session that keeps connections alive and reuses them across requests
+
+    Args:
+        headers (dict, optional): Headers sent with every request made through the session
+        pool_size (int, optional): Maximum number of connections kept open per host
+
+    Returns:
+        requests.Session: HTTP session
+    """
+    session = requests.Session()
+
+    adapter = HTTPAdapter(pool_block=True, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    if headers:
+        session.headers.update(headers)
+
+    return session
@@ -1,4 +1,8 @@
+from collections.abc import Callable
+from pathlib import Path
+
 import pytest
+from benedict import benedict
 
 
 @pytest.fixture(scope="module")
@@ -6,3 +10,30 @@ def vcr_config():
     return {
         "filter_headers": [("Authorization", "[REDACTED]")],
     }
+
+
+@pytest.fixture()
+def build_workspace() -> Callable[..., benedict]:
+    def build(id_: str = "ws-1", attributes: dict | None = None, state_version_id: str | None = None) -> benedict:
+        return benedict(
+            {
+                "attributes": attributes or {},
+                "id": id_,
+                "relationships": {
+                    "current-configuration-version": {"data": {"id": f"cv-{id_}"}},
+                    "current-state-version": {"data": {"id": state_version_id}},
+                    "organization": {"data": {"id": "org-1"}},
+                },
+            }
+        )
+
+    return build
+
+
+@pytest.fixture()
+def tmp_folder(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    # get_tmp_subfolder() relies on get_tmp_folder(), so it follows the patched folder everywhere
+    for module in ["spacemk", "spacemk.exporters.base", "spacemk.exporters.terraform"]:
+        monkeypatch.setattr(f"{module}.get_tmp_folder", lambda: tmp_path)
+
+    return tmp_path
@@ -0,0 +1,85 @@
+# ruff: noqa: SLF001
+import pytest
+import requests
+from benedict import benedict
+
+from spacemk.exporters.terraform import TerraformExporter
+
+
+def bad_request_error() -> RuntimeError:
+    response = requests.Response()
+    response.status_code = 400
+    error = RuntimeError("HTTP Error")
+    error.__cause__ = requests.exceptions.HTTPError(response=response)
+
+    return error
+
+
+def test_pages_are_requested_with_page_size_and_sparse_fieldsets(monkeypatch: pytest.MonkeyPatch):
+    exporter = TerraformExporter({})
+    urls = []
+    pages = [
+        {"data": [{"id": "ws-1"}], "links": {"next": "https://app.terraform.io/api/v2/ws?page%5Bnumber%5D=2"}},
+        {"data": [{"id": "ws-2"}]},
+    ]
+
+    def call_api(url: str, **kwargs) -> benedict:  # noqa: ARG001
+        urls.append(url)
+        return benedict(pages.pop(0))
+
+    monkeypatch.setattr(exporter, "_call_api", call_api)
+
+    data = exporter._extract_data_from_api(
+        path="/ws",
+        properties=["attributes.name", "attributes.vcs-repo.branch", "id", "relationships.project.data.id"],
+        resource_type="workspaces",
+    )
+
+    assert [datum.get("id") for datum in data] == ["ws-1", "ws-2"]
+    assert urls == [
+        "https://app.terraform.io/api/v2/ws?page[size]=100&fields[workspaces]=name,project,vcs-repo",
+        "https://app.terraform.io/api/v2/ws?page[size]=100&fields[workspaces]=name,project,vcs-repo&page[number]=2",
+    ]
+
+
+def test_query_params_are_dropped_once_rejected(monkeypatch: pytest.MonkeyPatch):
+    exporter = TerraformExporter({})
+    urls = []
+
+    def call_api(url: str, **kwargs) -> benedict:  # noqa: ARG001
+        urls.append(url)
+        if "?" in url:
+            raise bad_request_error()
+
+        return benedict({"data": [{"id": "ws-1"}]})
+
+    monkeypatch.setattr(exporter, "_call_api", call_api)
+
+    for _ in range(2):
+        exporter._extract_data_from_api(path="/ws", properties=["id"], resource_type="workspaces")
+
+    assert urls == [
+        "https://app.terraform.io/api/v2/ws?page[size]=100",
+        "https://app.terraform.io/api/v2/ws",
+        "https://app.terraform.io/api/v2/ws",
+    ]
+
+
+@pytest.mark.parametrize(("listed_status", "paths_count"), [("setup_complete", 1), (None, 2)])
+def test_modules_are_only_pulled_one_by_one_if_not_fully_listed(
+    monkeypatch: pytest.MonkeyPatch, listed_status: str | None, paths_count: int
+):
+    exporter = TerraformExporter({})
+    paths = []
+
+    def extract_data_from_api(path: str, **kwargs) -> list[dict]:  # noqa: ARG001
+        paths.append(path)
+        status = listed_status if path.endswith("/registry-modules") else "setup_complete"
+        return [benedict({"attributes": {"name": "vpc", "status": status}, "id": "mod-1"})]
+
+    monkeypatch.setattr(exporter, "_extract_data_from_api", extract_data_from_api)
+
+    data = exporter._extract_modules_data(benedict({"id": "org-1"}))
+
+    assert data[0].get("attributes.status") == "setup_complete"
+    assert len(paths) == paths_count
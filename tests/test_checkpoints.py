@@ -0,0 +1,106 @@
+# ruff: noqa: SLF001
+from pathlib import Path
+
+import pytest
+
+from spacemk.exporters import BaseExporter
+from spacemk.journal import Journal
+
+
+class FakeExporter(BaseExporter):
+    def __init__(self, fail_enrich: bool = False):
+        super().__init__({})
+        self.calls = []
+        self.fail_enrich = fail_enrich
+
+    def _enrich_data(self, data: dict) -> dict:
+        self.calls.append("enrich")
+        journal = self._get_journal("items")
+        for item in data["items"]:
+            if item in journal:
+                continue
+
+            if self.fail_enrich and item == "b":
+                raise RuntimeError("Interrupted")
+
+            journal.record(item, item.upper())
+            self.calls.append(item)
+
+        return {"items": [journal.get(item) for item in data["items"]]}
+
+    def _extract_data(self) -> dict:
+        self.calls.append("extract")
+        return {"items": ["a", "b"]}
+
+    def _map_data(self, data: dict) -> dict:
+        return data
+
+
+def test_journal_ignores_partial_lines(tmp_path: Path):
+    path = Path(tmp_path, "journal.jsonl")
+    Journal(path).record("ws-1", ["var-1"])
+    with path.open("a", encoding="utf-8") as fp:
+        fp.write('{"key": "ws-2", "val')
+
+    journal = Journal(path)
+
+    assert len(journal) == 1
+    assert journal.get("ws-1") == ["var-1"]
+    assert "ws-2" not in journal
+
+    journal.record("ws-3", ["var-3"])
+    journal = Journal(path)
+
+    assert journal.get("ws-1") == ["var-1"]
+    assert journal.get("ws-3") == ["var-3"]
+
+
+def test_export_resumes_where_it_stopped(monkeypatch: pytest.MonkeyPatch, tmp_folder: Path):  # noqa: ARG001
+    saved_data = []
+    monkeypatch.setattr("spacemk.exporters.base.save_normalized_data", lambda data, **_: saved_data.append(data))
+
+    exporter = FakeExporter(fail_enrich=True)
+    with pytest.raises(RuntimeError):
+        exporter.export()
+    assert exporter.calls == ["extract", "enrich", "a"]
+
+    exporter = FakeExporter()
+    exporter.export(resume=True)
+    assert exporter.calls == ["enrich", "b"]
+    assert saved_data == [{"items": ["A", "B"]}]
+
+    exporter = FakeExporter()
+    exporter.export()
+    assert exporter.calls == ["extract", "enrich", "a", "b"]
+
+
+def test_audit_does_not_journal_to_disk(monkeypatch: pytest.MonkeyPatch, tmp_folder: Path):
+    exporter = FakeExporter()
+    reports = []
+
+    # Like the Terraform exporter, which journals the variables it extracts
+    def extract_data() -> dict:
+        exporter._get_journal("items").record("a", "A")
+        return {"items": ["a"]}
+
+    monkeypatch.setattr(exporter, "_extract_data", extract_data)
+    monkeypatch.setattr(exporter, "_display_report", lambda data: reports.append(data))
+    monkeypatch.setattr(exporter, "_save_report_to_file", lambda data: None)  # noqa: ARG005
+    exporter.audit()
+
+    assert reports == [{"items": ["a"]}]
+    assert exporter._get_journal("items").get("a") == "A"
+    assert not Path(tmp_folder, "checkpoints").exists()
+
+
+def test_audit_extraction_is_reused_by_export(monkeypatch: pytest.MonkeyPatch, tmp_folder: Path):  # noqa: ARG001
+    saved_data = []
+    monkeypatch.setattr("spacemk.exporters.base.save_normalized_data", lambda data, **_: saved_data.append(data))
+
+    exporter = FakeExporter()
+    monkeypatch.setattr(exporter, "_display_report", lambda data: None)  # noqa: ARG005
+    monkeypatch.setattr(exporter, "_save_report_to_file", lambda data: None)  # noqa: ARG005
+    exporter.audit(then_export=True)
+
+    assert exporter.calls == ["extract", "enrich", "a", "b"]
+    assert saved_data == [{"items": ["A", "B"]}]
@@ -0,0 +1,44 @@
+# ruff: noqa: SLF001
+import random
+import time
+
+import pytest
+
+from spacemk.exporters.terraform import TerraformExporter
+from spacemk.record import compile_projection
+
+
+def extract_data_from_api(path: str, properties: list[str] | None = None, **kwargs) -> list[dict]:  # noqa: ARG001
+    # Calls complete in a random order when they run concurrently
+    time.sleep(random.uniform(0, 0.01))
+
+    segments = path.split("/")
+    organization_id = segments[2] if segments[1] == "organizations" and len(segments) > 2 else None  # noqa: PLR2004
+
+    data = []
+    for i in range(2):
+        id_ = f"{path.strip('/').replace('/', '-')}-{i}"
+        data.append(
+            {
+                "attributes": {"key": f"KEY_{i}", "name": id_, "status": "setup_complete"},
+                "id": id_,
+                "relationships": {"organization": {"data": {"id": organization_id}}},
+            }
+        )
+
+    return [compile_projection(properties)(datum) for datum in data] if properties else data
+
+
+def extract_data(monkeypatch: pytest.MonkeyPatch, concurrency: int) -> dict:
+    exporter = TerraformExporter({"concurrency": concurrency})
+    monkeypatch.setattr(exporter, "_extract_data_from_api", extract_data_from_api)
+
+    return exporter._extract_data()
+
+
+def test_extracted_data_does_not_depend_on_concurrency(monkeypatch: pytest.MonkeyPatch):
+    data = extract_data(monkeypatch, concurrency=1)
+
+    assert len(data["organizations"]) == 2  # noqa: PLR2004
+    assert len(data["workspace_variables"]) == 8  # noqa: PLR2004
+    assert extract_data(monkeypatch, concurrency=4) == data
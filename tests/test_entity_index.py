@@ -0,0 +1,28 @@
+from benedict import benedict
+
+from spacemk.entity_index import EntityIndex
+
+
+def build_variables() -> list[dict]:
+    return [
+        benedict({"id": "var-1", "relationships": {"workspace": {"data": {"id": "ws-1"}}}}),
+        benedict({"id": "var-2", "relationships": {"workspace": {"data": {"id": "ws-2"}}}}),
+        benedict({"id": "var-3", "relationships": {"workspace": {"data": {"id": "ws-1"}}}}),
+    ]
+
+
+def test_find():
+    variables = build_variables()
+    index = EntityIndex(variables)
+
+    assert index.find("var-2") is variables[1]
+    assert index.find("var-4") is None
+    assert index.find("ws-1", key="relationships.workspace.data.id") is variables[0]
+
+
+def test_find_all():
+    variables = build_variables()
+    index = EntityIndex(variables)
+
+    assert index.find_all("ws-1", key="relationships.workspace.data.id") == [variables[0], variables[2]]
+    assert index.find_all("ws-3", key="relationships.workspace.data.id") == []
@@ -0,0 +1,23 @@
+# ruff: noqa: SLF001
+from pathlib import Path
+
+import pytest
+
+from spacemk.generator import Generator
+
+
+def test_environment_is_reused_and_templates_are_cached(monkeypatch: pytest.MonkeyPatch, tmp_folder: Path):
+    generator = Generator()
+
+    environment = generator._get_environment()
+    environment.get_template("base.tf.jinja")
+
+    assert generator._get_environment() is environment
+    assert len(list(Path(tmp_folder, "templates-cache").iterdir())) == 1
+
+    # A new process starts from a new environment, which loads compiled templates from the cache
+    other_environment = Generator()._get_environment()
+    monkeypatch.setattr(
+        other_environment, "compile", lambda *args, **kwargs: pytest.fail("Template compiled again")  # noqa: ARG005
+    )
+    other_environment.get_template("base.tf.jinja")
@@ -0,0 +1,34 @@
+# ruff: noqa: SLF001
+from collections.abc import Callable
+
+import pytest
+from benedict import benedict
+
+from spacemk.exporters.terraform import TerraformExporter
+
+
+def build_attributes(latest_change_at: str) -> dict:
+    return {"latest-change-at": latest_change_at, "updated-at": "2024-01-01T00:00:00.000Z"}
+
+
+@pytest.mark.parametrize(("latest_change_at", "reused"), [("2024-01-02T00:00:00.000Z", True), ("2024-01-03", False)])
+def test_workspace_variables_are_reused_if_workspace_is_unchanged(
+    build_workspace: Callable[..., benedict], monkeypatch: pytest.MonkeyPatch, latest_change_at: str, reused: bool
+):
+    exporter = TerraformExporter({})
+    exporter._previous_extraction = benedict(
+        {
+            "workspace_variables": [
+                {"id": "var-1", "relationships": {"workspace": {"data": {"id": "ws-1"}}}},
+                {"id": "var-2", "relationships": {"workspace": {"data": {"id": "ws-2"}}}},
+            ],
+            "workspaces": [build_workspace(attributes=build_attributes("2024-01-02T00:00:00.000Z"))],
+        }
+    )
+    monkeypatch.setattr(exporter, "_extract_data_from_api", lambda **_: [benedict({"id": "var-3"})])
+
+    variables = exporter._extract_workspace_variables_data(
+        build_workspace(attributes=build_attributes(latest_change_at))
+    )
+
+    assert [variable.get("id") for variable in variables] == (["var-1"] if reused else ["var-3"])
@@ -0,0 +1,53 @@
+# ruff: noqa: SLF001
+from collections.abc import Callable
+
+from benedict import benedict
+
+from spacemk.exporters.terraform import TerraformExporter
+from spacemk.record import Record
+
+
+def build_variable(id_: str, workspace_id: str, key: str, sensitive: bool | None) -> dict:
+    return {
+        "attributes": {"category": "terraform", "key": key, "sensitive": sensitive},
+        "id": id_,
+        "relationships": {"workspace": {"data": {"id": workspace_id}}},
+    }
+
+
+def test_variables_with_invalid_name_are_flagged_by_sensitivity(build_workspace: Callable[..., benedict]):
+    workspace_ids = ["ws-plain", "ws-secret", "ws-unknown", "ws-valid"]
+    src_data = Record.from_data(
+        {
+            "modules": [],
+            "organizations": [{"attributes": {"name": "org-1"}, "id": "org-1"}],
+            "workspace_variables": [
+                build_variable("var-1", "ws-plain", "invalid-name", sensitive=False),
+                build_variable("var-2", "ws-secret", "invalid-name", sensitive=True),
+                build_variable("var-3", "ws-unknown", "invalid-name", sensitive=None),
+                build_variable("var-4", "ws-valid", "valid_name", sensitive=True),
+            ],
+            "workspaces": [
+                build_workspace(workspace_id, attributes={"name": workspace_id}) for workspace_id in workspace_ids
+            ],
+        }
+    )
+
+    data = TerraformExporter({})._map_data(src_data)
+
+    assert {
+        stack["_source_id"]: (stack["has_variables_with_invalid_name"], stack["has_secret_variables_with_invalid_name"])
+        for stack in data["stacks"]
+    } == {
+        "ws-plain": (True, False),
+        "ws-secret": (False, True),
+        # Variables with an unknown sensitivity are considered both plain and secret
+        "ws-unknown": (True, True),
+        "ws-valid": (False, False),
+    }
+    assert {variable["_source_id"]: variable["valid_name"] for variable in data["stack_variables"]} == {
+        "var-1": False,
+        "var-2": False,
+        "var-3": False,
+        "var-4": True,
+    }
@@ -0,0 +1,74 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from spacemk import load_normalized_data, resolve_relationships, save_normalized_data
+
+
+def test_resolve_relationships():
+    data = {
+        "spaces": [{"_migration_id": "space_1", "_relationships": {}, "_source_id": "org-1"}],
+        "stacks": [{"_migration_id": "stack_1", "_relationships": {"space": "org-1"}, "_source_id": "ws-1"}],
+        "stack_variables": [
+            {"_relationships": {"space": "org-1", "stack": "ws-1"}, "_source_id": "var-1"},
+            {"_relationships": {"space": "org-2", "stack": {"_migration_id": "expanded"}}, "_source_id": "var-2"},
+        ],
+    }
+
+    resolve_relationships(data)
+
+    assert data["stacks"][0]["_relationships"]["space"] is data["spaces"][0]
+    stack_variable_relationships = data["stack_variables"][0]["_relationships"]
+    assert stack_variable_relationships["stack"] is data["stacks"][0]
+    assert stack_variable_relationships["stack"]["_relationships"]["space"]["_migration_id"] == "space_1"
+    assert data["stack_variables"][1]["_relationships"] == {"space": None, "stack": {"_migration_id": "expanded"}}
+
+
+def build_data() -> dict:
+    return {
+        "modules": [{"_source_id": "mod-1"}],
+        "spaces": [{"_migration_id": "space_1", "_source_id": "org-1"}],
+        "stacks": [{"_migration_id": "stack_1", "_relationships": {"space": "org-1"}, "_source_id": "ws-1"}],
+    }
+
+
+def test_normalized_data_is_loaded_per_entity_type(tmp_folder: Path):
+    save_normalized_data(build_data(), pretty=False)
+
+    data = load_normalized_data(entity_types=["stacks"])
+
+    assert not Path(tmp_folder, "data.json").exists()
+    assert sorted(data.keys()) == ["spaces", "stacks"]
+    assert data.get("stacks[0]._relationships.space._migration_id") == "space_1"
+
+
+def test_normalized_data_is_loaded_from_pretty_file_if_edited(tmp_folder: Path):
+    save_normalized_data(build_data())
+    assert load_normalized_data(entity_types=["modules"]) == {"modules": [{"_source_id": "mod-1"}]}
+
+    pretty_path = Path(tmp_folder, "data.json")
+    pretty_data = json.loads(pretty_path.read_text())
+    pretty_data["modules"][0]["_source_id"] = "mod-2"
+    pretty_path.write_text(json.dumps(pretty_data))
+    os.utime(pretty_path, (time.time() + 10, time.time() + 10))
+
+    assert load_normalized_data(entity_types=["modules"]) == {"modules": [{"_source_id": "mod-2"}]}
+
+
+@pytest.mark.usefixtures("tmp_folder")
+def test_normalized_data_is_cached_until_modified():
+    save_normalized_data(build_data(), pretty=False)
+
+    data = load_normalized_data(entity_types=["stacks"])
+    assert load_normalized_data(entity_types=["stacks"]) is data
+    assert load_normalized_data().get("stacks") is data.get("stacks")
+    assert load_normalized_data(entity_types=["spaces"]).get("spaces") is data.get("spaces")
+
+    data = build_data()
+    data["stacks"][0]["_migration_id"] = "stack_2"
+    save_normalized_data(data, pretty=False)
+
+    assert load_normalized_data(entity_types=["stacks"]).get("stacks[0]._migration_id") == "stack_2"
@@ -0,0 +1,79 @@
+from spacemk.plan_log import (
+    EXPORT_END_MARKER,
+    EXPORT_JSON_END_MARKER,
+    EXPORT_JSON_START_MARKER,
+    EXPORT_START_MARKER,
+    iter_lines,
+    parse_env_vars,
+)
+
+
+def test_iter_lines():
+    chunks = ["FOO=b", "ar\nBAZ=1\u2028", "2\n\nQUX", "="]
+
+    assert list(iter_lines(chunks)) == ["FOO=bar", "BAZ=1\u20282", "", "QUX="]
+
+
+def test_parse_env_vars_reads_export_block_only():
+    lines = [
+        "Terraform v1.5.7",
+        "FOO=outside",
+        EXPORT_START_MARKER,
+        "FOO=bar=baz",
+        "CERTIFICATE=-----BEGIN-----",
+        "abc",
+        "-----END-----",
+        "EMPTY=",
+        EXPORT_END_MARKER,
+        "FOO=after",
+    ]
+
+    assert parse_env_vars(iter(lines)) == {
+        "CERTIFICATE": "-----BEGIN-----\nabc\n-----END-----",
+        "EMPTY": "",
+        "FOO": "bar=baz",
+    }
+
+
+def test_parse_env_vars_stops_reading_at_end_marker():
+    lines = iter([EXPORT_START_MARKER, "FOO=bar", EXPORT_END_MARKER, "BAZ=qux"])
+
+    parse_env_vars(lines)
+
+    assert list(lines) == ["BAZ=qux"]
+
+
+def test_parse_env_vars_without_markers():
+    lines = ["Terraform v1.5.7", "FOO=bar", "  continued", "BAZ=qux"]
+
+    assert parse_env_vars(lines) == {"BAZ": "qux", "FOO": "bar"}
+
+
+def test_parse_env_vars_reads_json_document():
+    lines = iter(
+        [
+            EXPORT_JSON_START_MARKER,
+            '{"CERTIFICATE":"LS0tLS1CRUdJTi0tLS0tCmFiYw==","EMPTY":""}',
+            EXPORT_JSON_END_MARKER,
+            "FOO=bar",
+        ]
+    )
+
+    assert parse_env_vars(lines) == {"CERTIFICATE": "-----BEGIN-----\nabc", "EMPTY": ""}
+    assert list(lines) == [EXPORT_JSON_END_MARKER, "FOO=bar"]
+
+
+def test_parse_env_vars_reads_names_that_are_not_shell_identifiers():
+    lines = [EXPORT_START_MARKER, "DB_PASSWORD=hunter2", "my-token=abc", EXPORT_END_MARKER]
+
+    assert parse_env_vars(lines) == {"DB_PASSWORD": "hunter2", "my-token": "abc"}
+
+
+def test_parse_env_vars_with_names_keeps_unknown_non_identifiers_as_continuation_lines():
+    lines = [EXPORT_START_MARKER, "KEY=QUJD", "RE+G=", "my-token=abc", "HOME=/root", EXPORT_END_MARKER]
+
+    assert parse_env_vars(lines, names={"KEY", "my-token"}) == {
+        "HOME": "/root",
+        "KEY": "QUJD\nRE+G=",
+        "my-token": "abc",
+    }
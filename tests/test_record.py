@@ -0,0 +1,70 @@
+import json
+
+from spacemk.record import Record, compile_projection, flatten
+
+
+def test_get_by_keypath():
+    record = Record.from_data({"attributes": {"vcs-repo": {"identifier": "a/b"}, "vcs.url": "x"}, "id": "ws-1"})
+
+    assert record.get("attributes.vcs-repo.identifier") == "a/b"
+    assert record.get("attributes.vcs-repo.branch", "main") == "main"
+    assert record.get("id.missing") is None
+    assert record.get("attributes").get("vcs.url") == "x"
+
+
+def test_set_by_keypath_creates_nested_records():
+    record = Record({"attributes": {"vcs-repo": None}})
+
+    record["attributes.vcs-repo.branch"] = "main"
+    record["relationships.organization.data.id"] = "org-1"
+
+    assert record == {
+        "attributes": {"vcs-repo": {"branch": "main"}},
+        "relationships": {"organization": {"data": {"id": "org-1"}}},
+    }
+    assert isinstance(record["relationships"]["organization"], Record)
+    assert json.loads(json.dumps(record)) == record
+
+
+def test_clone_copies_nested_data():
+    record = Record.from_data({"_relationships": {"space": "org-1"}, "tags": ["a"]})
+
+    clone = record.clone()
+    del clone["_relationships"]
+    clone["tags"].append("b")
+
+    assert record == {"_relationships": {"space": "org-1"}, "tags": ["a"]}
+
+
+def test_flatten():
+    data = {"attributes": {"name": "ws", "vcs-repo": {"branch": "main"}}, "empty": {}, "tags": [{"a": 1}]}
+
+    assert flatten(data) == {"attributes.name": "ws", "attributes.vcs-repo.branch": "main", "tags": [{"a": 1}]}
+    assert Record(data).flatten(separator="/")["attributes/vcs-repo/branch"] == "main"
+
+
+def test_compile_projection():
+    properties = ["attributes.name", "attributes.vcs-repo.branch", "attributes.vcs-repo.identifier", "id", "missing.id"]
+    project = compile_projection(properties)
+
+    data = {"attributes": {"name": "ws", "other": 1, "vcs-repo": None}, "id": "ws-1", "type": "workspaces"}
+    expected = Record()
+    for property_ in properties:
+        expected[property_] = Record.from_data(data).get(property_)
+
+    assert project(data) == expected
+    assert project(data) == {
+        "attributes": {"name": "ws", "vcs-repo": {"branch": None, "identifier": None}},
+        "id": "ws-1",
+        "missing": {"id": None},
+    }
+    assert isinstance(project(data)["attributes"], Record)
+    assert compile_projection(list(properties)) is project
+
+
+def test_compile_projection_extracts_parent_properties_as_a_whole():
+    project = compile_projection(["attributes.vcs-repo", "attributes.vcs-repo.branch"])
+
+    assert project({"attributes": {"vcs-repo": {"branch": "main", "identifier": "a/b"}}}) == {
+        "attributes": {"vcs-repo": {"branch": "main", "identifier": "a/b"}}
+    }
@@ -0,0 +1,185 @@
+# ruff: noqa: SLF001
+from collections.abc import Callable
+from unittest.mock import MagicMock
+
+import pytest
+from benedict import benedict
+
+from spacemk.exporters.terraform import TerraformExporter
+
+
+def test_harvest_restores_workspace_when_plan_fails(
+    build_workspace: Callable[..., benedict], monkeypatch: pytest.MonkeyPatch
+):
+    exporter = TerraformExporter({})
+    calls = []
+
+    def extract_data_from_api(method: str = "GET", path: str = "", **kwargs) -> list[dict]:  # noqa: ARG001
+        calls.append((method, path))
+        if method == "GET":
+            return [benedict({"attributes": {"execution-mode": "remote"}})]
+
+        return [benedict({"relationships": {"plan": {"data": {"id": "plan-1"}}}})]
+
+    def get_plan(id_: str) -> dict:
+        raise RuntimeError(f"Plan '{id_}' failed")
+
+    monkeypatch.setattr(exporter, "_extract_data_from_api", extract_data_from_api)
+    monkeypatch.setattr(exporter, "_get_plan", get_plan)
+
+    with pytest.raises(RuntimeError):
+        exporter._harvest_workspace_variables(agent_pool_id="apool-1", workspace=build_workspace("ws-1"), variables=[])
+
+    assert calls == [
+        ("GET", "/workspaces/ws-1"),
+        ("PATCH", "/workspaces/ws-1"),
+        ("POST", "/runs"),
+        ("PATCH", "/workspaces/ws-1"),
+    ]
+
+
+def test_harvest_cancels_run_before_restoring_workspace_when_plan_times_out(
+    build_workspace: Callable[..., benedict], monkeypatch: pytest.MonkeyPatch
+):
+    exporter = TerraformExporter({})
+    calls = []
+
+    def extract_data_from_api(method: str = "GET", path: str = "", **kwargs) -> list[dict]:  # noqa: ARG001
+        calls.append((method, path))
+        if method == "GET":
+            return [benedict({"attributes": {"execution-mode": "remote"}})]
+
+        return [benedict({"id": "run-1", "relationships": {"plan": {"data": {"id": "plan-1"}}}})]
+
+    monkeypatch.setattr(exporter, "_extract_data_from_api", extract_data_from_api)
+    monkeypatch.setattr(exporter, "_get_plan", lambda **_: benedict({"attributes": {"status": "queued"}}))
+
+    exporter._harvest_workspace_variables(agent_pool_id="apool-1", workspace=build_workspace("ws-1"), variables=[])
+
+    assert calls == [
+        ("GET", "/workspaces/ws-1"),
+        ("PATCH", "/workspaces/ws-1"),
+        ("POST", "/runs"),
+        ("POST", "/runs/run-1/actions/cancel"),
+        ("PATCH", "/workspaces/ws-1"),
+    ]
+
+
+def test_harvest_uses_one_agent_per_run_in_flight(
+    build_workspace: Callable[..., benedict], monkeypatch: pytest.MonkeyPatch
+):
+    exporter = TerraformExporter({"agent_count": 2})
+    container_names = []
+    harvested_workspace_ids = []
+
+    def start_agent_container(agent_pool_id: str, container_name: str, variable_names: list[str]) -> MagicMock:
+        assert agent_pool_id == "apool-1"
+        assert variable_names == ["ATLAS_CONFIGURATION_VERSION_GITHUB_BRANCH", "SECRET_1", "SECRET_2"]
+        container_names.append(container_name)
+        return MagicMock()
+
+    monkeypatch.setattr(exporter, "_create_agent_pool", lambda organization_id: "apool-1")  # noqa: ARG005
+    monkeypatch.setattr(exporter, "_delete_agent_pool", lambda id_: None)  # noqa: ARG005
+    monkeypatch.setattr(exporter, "_start_agent_container", start_agent_container)
+    monkeypatch.setattr(exporter, "_stop_agent_container", lambda container: None)  # noqa: ARG005
+    monkeypatch.setattr(
+        exporter,
+        "_harvest_workspace_variables",
+        lambda agent_pool_id, workspace, variables: harvested_workspace_ids.append(workspace.get("id")),  # noqa: ARG005
+    )
+
+    workspaces = [
+        (build_workspace(f"ws-{i}"), [benedict({"attributes": {"key": f"SECRET_{i % 2 + 1}"}})]) for i in range(3)
+    ]
+    exporter._enrich_organization_workspace_variable_data(organization_id="org-1", workspaces=workspaces)
+
+    assert container_names == ["smk-tfc-agent-org-1", "smk-tfc-agent-org-1-2"]
+    assert sorted(harvested_workspace_ids) == ["ws-0", "ws-1", "ws-2"]
+
+
+def build_plan_poller(monkeypatch: pytest.MonkeyPatch, config: dict, statuses: list[str]) -> tuple:
+    exporter = TerraformExporter(config)
+    clock = [0.0]
+    delays = []
+
+    def sleep(delay: float) -> None:
+        delays.append(delay)
+        clock[0] += delay
+
+    def extract_data_from_api(path: str, properties: list[str], **kwargs) -> list[dict]:  # noqa: ARG001
+        return [benedict({"attributes": {"log-read-url": "https://example.com/logs", "status": statuses.pop(0)}})]
+
+    monkeypatch.setattr("spacemk.exporters.terraform.time.monotonic", lambda: clock[0])
+    monkeypatch.setattr("spacemk.exporters.terraform.time.sleep", sleep)
+    monkeypatch.setattr(exporter, "_extract_data_from_api", extract_data_from_api)
+
+    return exporter, delays
+
+
+def test_get_plan_backs_off_and_resets_on_status_change(monkeypatch: pytest.MonkeyPatch):
+    statuses = ["queued", "queued", "queued", "running", "running", "finished"]
+    exporter, delays = build_plan_poller(monkeypatch, {"plan_poll_max_interval": 1.5}, statuses)
+
+    data = exporter._get_plan("plan-1")
+
+    assert data.get("attributes.status") == "finished"
+    assert delays == [0.5, 1.0, 1.5, 0.5, 1.0]
+
+
+def test_get_plan_gives_up_on_status_timeout(monkeypatch: pytest.MonkeyPatch):
+    statuses = ["pending"] * 10
+    exporter, delays = build_plan_poller(monkeypatch, {"plan_status_timeouts": {"pending": 3}}, statuses)
+
+    assert exporter._get_plan("plan-1").get("attributes.status") == "pending"
+    assert sum(delays) == pytest.approx(3.5)
+
+
+@pytest.mark.parametrize(("existing_names", "deleted"), [(["SMK"], False), (["other"], True)])
+def test_agent_pool_is_reused_and_only_deleted_if_created(
+    monkeypatch: pytest.MonkeyPatch, existing_names: list[str], deleted: bool
+):
+    exporter = TerraformExporter({})
+    calls = []
+
+    def extract_data_from_api(method: str = "GET", path: str = "", **kwargs) -> list[dict]:  # noqa: ARG001
+        calls.append(method)
+        if method == "GET":
+            return [benedict({"attributes": {"name": name}, "id": f"apool-{name}"}) for name in existing_names]
+
+        return [benedict({"id": "apool-new"})]
+
+    monkeypatch.setattr(exporter, "_extract_data_from_api", extract_data_from_api)
+
+    agent_pool_id = exporter._create_agent_pool(organization_id="org-1")
+    exporter._delete_agent_pool(id_=agent_pool_id)
+
+    assert agent_pool_id == ("apool-new" if deleted else "apool-SMK")
+    assert calls == (["GET", "POST", "DELETE"] if deleted else ["GET"])
+
+
+@pytest.mark.parametrize(("labels", "removed"), [({"smk.fingerprint": "abc"}, True), ({}, False), (None, False)])
+def test_only_agent_containers_started_by_the_exporter_are_removed(labels: dict | None, removed: bool):
+    exporter = TerraformExporter({})
+    container = MagicMock()
+    container.config.labels = labels
+    container.host_config.auto_remove = False
+
+    exporter._stop_agent_container(container)
+
+    container.stop.assert_called_once()
+    assert container.remove.called is removed
+
+
+def test_agent_container_started_by_hand_without_labels_is_reused(monkeypatch: pytest.MonkeyPatch):
+    exporter = TerraformExporter({})
+    exporter._agent_image_pulled = True
+    container = MagicMock()
+    container.config.labels = None
+    docker = MagicMock()
+    docker.container.exists.return_value = True
+    docker.container.inspect.return_value = container
+    monkeypatch.setattr("spacemk.exporters.terraform.docker", docker)
+
+    assert exporter._start_agent_container(agent_pool_id="apool-1", container_name="smk-tfc-agent-org-1") is container
+    container.remove.assert_not_called()
+    docker.run.assert_not_called()
@@ -0,0 +1,52 @@
+import pytest
+
+from spacemk import save_normalized_data
+from spacemk.entity_index import EntityIndex
+from spacemk.spacelift import Spacelift
+
+
+@pytest.mark.usefixtures("tmp_folder")
+def test_terraform_vars_with_invalid_name_are_indexed_once(monkeypatch: pytest.MonkeyPatch):
+    stacks = [
+        {"_source_id": f"ws-{i}", "has_variables_with_invalid_name": True, "slug": f"stack-{i}", "vcs": {}}
+        for i in range(2)
+    ]
+    stack_variables = [
+        {
+            "_relationships": {"stack": f"ws-{i % 2}"},
+            "_source_id": f"var-{i}",
+            "name": f"var-{i}",
+            "type": "terraform",
+            "valid_name": i == 0,
+            "value": f"value-{i}",
+            "write_only": i > 1 and i % 2 == 1,
+        }
+        for i in range(4)
+    ]
+    save_normalized_data({"stack_variables": stack_variables, "stacks": stacks}, pretty=False)
+
+    indexes = []
+    mounted_files = []
+
+    class CountingEntityIndex(EntityIndex):
+        def __init__(self, entities: list[dict]):
+            super().__init__(entities)
+            indexes.append(self)
+
+    monkeypatch.setattr("spacemk.spacelift.EntityIndex", CountingEntityIndex)
+    monkeypatch.setattr(
+        Spacelift,
+        "_set_mounted_file_content",
+        lambda self, content, filename, stack_id, write_only=False: mounted_files.append(  # noqa: ARG005
+            (stack_id, filename.rsplit("/", 1)[-1], content)
+        ),
+    )
+    Spacelift({}).set_terraform_vars_with_invalid_name()
+
+    assert len(indexes) == 1
+    assert mounted_files == [
+        ("stack-0", "tf_vars_with_invalid_name.auto.tfvars", 'var-2 = "value-2"\n'),
+        ("stack-0", "tf_secret_vars_with_invalid_name.auto.tfvars", ""),
+        ("stack-1", "tf_vars_with_invalid_name.auto.tfvars", 'var-1 = "value-1"\n'),
+        ("stack-1", "tf_secret_vars_with_invalid_name.auto.tfvars", 'var-3 = "value-3"\n'),
+    ]
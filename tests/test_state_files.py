@@ -0,0 +1,103 @@
+# ruff: noqa: SLF001
+import hashlib
+import json
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+from benedict import benedict
+
+from spacemk.exporters.terraform import TerraformExporter
+
+
+def build_state_file_downloader(monkeypatch: pytest.MonkeyPatch, content: bytes) -> tuple:
+    exporter = TerraformExporter({})
+    downloaded_urls = []
+
+    def extract_data_from_api(path: str, **kwargs) -> list[dict]:  # noqa: ARG001
+        return [benedict({"attributes": {"hosted-state-download-url": f"https://example.com{path}", "serial": 2}})]
+
+    def download_file(path: Path, url: str) -> str:
+        downloaded_urls.append(url)
+        path.write_bytes(content)
+        return hashlib.sha256(content).hexdigest()
+
+    monkeypatch.setattr(exporter, "_extract_data_from_api", extract_data_from_api)
+    monkeypatch.setattr(exporter, "_download_file", download_file)
+
+    return exporter, downloaded_urls
+
+
+def write_state_file(tmp_folder: Path, content: bytes) -> dict:
+    path = Path(tmp_folder, "state-files", "org-1", "ws-1.tfstate")
+    path.parent.mkdir(parents=True)
+    path.write_bytes(content)
+
+    return {"sha256": hashlib.sha256(content).hexdigest(), "state_version_id": "sv-1", "workspace_id": "ws-1"}
+
+
+def test_unchanged_state_file_is_not_downloaded_again(
+    build_workspace: Callable[..., benedict], monkeypatch: pytest.MonkeyPatch, tmp_folder: Path
+):
+    exporter, downloaded_urls = build_state_file_downloader(monkeypatch, b'{"lineage": "abc"}')
+    manifest_entry = write_state_file(tmp_folder, b'{"lineage": "abc"}')
+
+    entry = exporter._download_state_file(
+        workspace=build_workspace("ws-1", state_version_id="sv-1"), manifest_entry=manifest_entry
+    )
+
+    assert entry == manifest_entry
+    assert downloaded_urls == []
+
+
+@pytest.mark.parametrize(
+    ("state_version_id", "local_content"),
+    [("sv-2", b'{"lineage": "abc"}'), ("sv-1", b'{"lineage": "ab')],
+    ids=["new_state_version", "modified_local_file"],
+)
+def test_changed_state_file_is_downloaded_again(
+    build_workspace: Callable[..., benedict],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_folder: Path,
+    state_version_id: str,
+    local_content: bytes,
+):
+    exporter, downloaded_urls = build_state_file_downloader(monkeypatch, b'{"lineage": "abc"}')
+    manifest_entry = write_state_file(tmp_folder, b'{"lineage": "abc"}')
+    Path(tmp_folder, "state-files", "org-1", "ws-1.tfstate").write_bytes(local_content)
+
+    workspace = build_workspace("ws-1", state_version_id=state_version_id)
+    entry = exporter._download_state_file(workspace=workspace, manifest_entry=manifest_entry)
+
+    assert downloaded_urls == [f"https://example.com/state-versions/{state_version_id}"]
+    assert entry["lineage"] == "abc"
+    assert entry["sha256"] == manifest_entry["sha256"]
+    assert entry["state_version_id"] == state_version_id
+
+
+@pytest.mark.usefixtures("tmp_folder")
+def test_manifest_recovers_from_partially_written_line(
+    build_workspace: Callable[..., benedict], monkeypatch: pytest.MonkeyPatch
+):
+    exporter = TerraformExporter({})
+    manifest_path = exporter._get_state_files_manifest_path()
+    with manifest_path.open("w", encoding="utf-8") as fp:
+        fp.write(json.dumps({"state_version_id": "sv-1", "workspace_id": "ws-1"}) + "\n")
+        fp.write('{"state_version_id": "sv-2", "work')
+
+    def download_state_file(workspace: dict, manifest_entry: dict | None) -> dict:
+        if workspace.get("id") == "ws-3":
+            raise RuntimeError("Interrupted")
+
+        return manifest_entry or {"state_version_id": "sv-2", "workspace_id": workspace.get("id")}
+
+    monkeypatch.setattr(exporter, "_download_state_file", download_state_file)
+
+    workspaces = [build_workspace(f"ws-{i}", state_version_id=f"sv-{i}") for i in range(1, 4)]
+    with pytest.raises(RuntimeError):
+        exporter._download_state_files({"workspaces": workspaces})
+
+    assert exporter._load_state_files_manifest() == {
+        "ws-1": {"state_version_id": "sv-1", "workspace_id": "ws-1"},
+        "ws-2": {"state_version_id": "sv-2", "workspace_id": "ws-2"},
+    }
@@ -0,0 +1,248 @@
+# ruff: noqa: SLF001
+import io
+import logging
+import os
+from http import HTTPStatus
+from pathlib import Path
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from spacemk.response_cache import ResponseCache
+from spacemk.transport import (
+    RateLimiter,
+    Transport,
+    configure_tracing,
+    get_endpoint_name,
+    parse_retry_after,
+    trace_response,
+)
+
+
+class FakeAdapter(BaseAdapter):
+    def __init__(self, responses: list[tuple[int, dict]]):
+        super().__init__()
+        self.requests = []
+        self._responses = responses
+
+    def close(self):
+        pass
+
+    def send(self, request, **kwargs):  # noqa: ARG002
+        self.requests.append(request)
+        status_code, headers = self._responses.pop(0)
+
+        response = requests.Response()
+        response.headers.update(headers)
+        response.raw = io.BytesIO(b"{}")
+        response.request = request
+        response.status_code = status_code
+        response.url = request.url
+
+        return response
+
+
+def build_transport(
+    responses: list[tuple[int, dict]], max_retries: int = 3, cache: ResponseCache | None = None, offline: bool = False
+) -> tuple[Transport, FakeAdapter]:
+    transport = Transport(backoff_base=0, cache=cache, max_retries=max_retries, offline=offline)
+    adapter = FakeAdapter(responses)
+    transport._session.mount("https://", adapter)
+
+    return transport, adapter
+
+
+def build_response(headers: dict) -> requests.Response:
+    response = requests.Response()
+    response.headers.update(headers)
+
+    return response
+
+
+def test_get_endpoint_name():
+    url = "https://app.terraform.io/api/v2/workspaces/ws-4Ab8cD9eF1gH2iJ3/vars?page%5Bnumber%5D=2"
+    assert get_endpoint_name("get", url) == "GET /api/v2/workspaces/{id}/vars"
+
+
+@pytest.mark.parametrize(
+    ("headers", "expected"),
+    [
+        ({}, None),
+        ({"Retry-After": "3"}, 3.0),
+        ({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0.0),
+        ({"X-RateLimit-Reset": "0.25"}, 0.25),
+        ({"Retry-After": "2", "X-RateLimit-Reset": "0.25"}, 2.0),
+        ({"X-RateLimit-Reset": "soon"}, None),
+    ],
+)
+def test_parse_retry_after(headers: dict, expected: float | None):
+    assert parse_retry_after(build_response(headers)) == expected
+
+
+def test_rate_limiter_throttles_once_burst_is_used(monkeypatch: pytest.MonkeyPatch):
+    delays = []
+    monkeypatch.setattr("spacemk.transport.time.monotonic", lambda: 100.0)
+    monkeypatch.setattr("spacemk.transport.time.sleep", delays.append)
+
+    limiter = RateLimiter(rate=10, burst=2)
+    for _ in range(4):
+        limiter.acquire("https://app.terraform.io/api/v2/organizations")
+    limiter.acquire("https://example.com/state")
+
+    assert delays == [pytest.approx(0.1), pytest.approx(0.2)]
+
+
+def test_transport_retries_throttled_requests(monkeypatch: pytest.MonkeyPatch):
+    delays = []
+    monkeypatch.setattr("spacemk.transport.time.sleep", delays.append)
+
+    transport, adapter = build_transport([(429, {"Retry-After": "2"}), (503, {}), (200, {})])
+    response = transport.request("GET", "https://app.terraform.io/api/v2/organizations")
+
+    assert response.status_code == HTTPStatus.OK
+    assert [r.url for r in adapter.requests] == ["https://app.terraform.io/api/v2/organizations"] * 3
+    assert delays == [2.0, 0.0]
+    assert transport.retry_stats.items() == [("GET /api/v2/organizations", 2, 2.0)]
+
+
+def test_transport_retries_throttled_non_idempotent_requests(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("spacemk.transport.time.sleep", lambda _: None)
+
+    transport, adapter = build_transport([(429, {}), (201, {})])
+    response = transport.request("POST", "https://app.terraform.io/api/v2/runs")
+
+    assert response.status_code == HTTPStatus.CREATED
+    assert transport.retry_stats.items() == [("POST /api/v2/runs", 1, 0.0)]
+
+
+def test_transport_does_not_retry_non_idempotent_server_errors(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("spacemk.transport.time.sleep", lambda _: None)
+
+    transport, _ = build_transport([(503, {}), (201, {})])
+    response = transport.request("POST", "https://app.terraform.io/api/v2/runs")
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert transport.retry_stats.items() == []
+
+
+def test_transport_gives_up_after_max_retries(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("spacemk.transport.time.sleep", lambda _: None)
+
+    transport, _ = build_transport([(429, {})] * 3, max_retries=2)
+    response = transport.request("GET", "https://app.terraform.io/api/v2/organizations")
+
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert transport.retry_stats.items() == [("GET /api/v2/organizations", 2, 0.0)]
+
+
+def test_trace_response_is_skipped_unless_debug_is_enabled(caplog: pytest.LogCaptureFixture):
+    transport, _ = build_transport([(200, {})])
+    response = transport.request("GET", "https://app.terraform.io/api/v2/organizations")
+
+    with caplog.at_level(logging.INFO, logger="spacemk.http"):
+        trace_response(response)
+
+    assert caplog.records == []
+
+
+def test_trace_response_redacts_and_truncates(caplog: pytest.LogCaptureFixture):
+    transport, _ = build_transport([(200, {})])
+    response = transport.request(
+        "POST",
+        "https://example.app.spacelift.io/graphql",
+        headers={"Authorization": "Bearer secret-token"},
+        json={"variables": {"apiKeySecret": "secret-value", "padding": "x" * 100}},
+    )
+
+    configure_tracing(max_body_size=80)
+    try:
+        with caplog.at_level(logging.DEBUG, logger="spacemk.http"):
+            trace_response(response)
+    finally:
+        configure_tracing()
+
+    assert "> POST https://example.app.spacelift.io/graphql" in caplog.text
+    assert "> Authorization: [REDACTED]" in caplog.text
+    assert '"apiKeySecret": "[REDACTED]"' in caplog.text
+    assert "more bytes truncated" in caplog.text
+    assert "secret" not in caplog.text.replace("apiKeySecret", "")
+
+
+def test_transport_serves_fresh_responses_from_cache(tmp_path: Path):
+    cache = ResponseCache(folder=tmp_path, max_size=1024, ttl=60)
+    transport, adapter = build_transport([(200, {}), (200, {})], cache=cache)
+
+    for _ in range(2):
+        response = transport.request("GET", "https://app.terraform.io/api/v2/organizations")
+        assert response.json() == {}
+
+    transport.request("GET", "https://app.terraform.io/api/v2/organizations", cache=False)
+
+    assert len(adapter.requests) == 2  # noqa: PLR2004
+
+
+def test_transport_revalidates_expired_responses(tmp_path: Path):
+    cache = ResponseCache(folder=tmp_path, max_size=1024, ttl=0)
+    transport, adapter = build_transport([(200, {"ETag": 'W/"1"'}), (304, {})], cache=cache)
+
+    transport.request("GET", "https://app.terraform.io/api/v2/organizations")
+    response = transport.request("GET", "https://app.terraform.io/api/v2/organizations")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {}
+    assert adapter.requests[1].headers["If-None-Match"] == 'W/"1"'
+
+
+def test_transport_only_uses_cache_when_offline(tmp_path: Path):
+    cache = ResponseCache(folder=tmp_path, max_size=1024, ttl=0)
+    transport, _ = build_transport([(200, {})], cache=cache)
+    transport.request("GET", "https://app.terraform.io/api/v2/organizations")
+
+    transport, adapter = build_transport([], cache=cache, offline=True)
+    response = transport.request("GET", "https://app.terraform.io/api/v2/organizations")
+    assert response.status_code == HTTPStatus.OK
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.request("GET", "https://app.terraform.io/api/v2/workspaces")
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.request("POST", "https://app.terraform.io/api/v2/runs")
+
+    assert adapter.requests == []
+
+
+def test_response_cache_evicts_least_recently_used_entries(tmp_path: Path):
+    transport, _ = build_transport([(200, {})] * 3)
+    response = transport.request("GET", "https://app.terraform.io/api/v2/organizations")
+
+    cache = ResponseCache(folder=tmp_path, max_size=1024, ttl=60)
+    cache.store("a", response)
+    entry_size = Path(tmp_path, "a.json").stat().st_size
+    # Room for two entries, whatever the length of their timestamp
+    cache = ResponseCache(folder=tmp_path, max_size=entry_size * 2 + entry_size // 2, ttl=60)
+    cache.store("b", response)
+    # Make sure "b" is the least recently used entry, whatever the file system timestamps resolution
+    os.utime(Path(tmp_path, "b.json"), (0, 0))
+    cache.get("a")
+    cache.store("c", response)
+
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["a.json", "c.json"]
+
+
+def test_response_cache_only_lists_entries_on_startup(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    transport, _ = build_transport([(200, {})])
+    response = transport.request("GET", "https://app.terraform.io/api/v2/organizations")
+
+    cache = ResponseCache(folder=tmp_path, max_size=1024, ttl=60)
+    for key in ["a", "b"]:
+        cache.store(key, response)
+    entry_size = Path(tmp_path, "a.json").stat().st_size
+    # "b" is the least recently used entry of a previous export
+    os.utime(Path(tmp_path, "b.json"), (0, 0))
+
+    cache = ResponseCache(folder=tmp_path, max_size=entry_size * 2 + entry_size // 2, ttl=60)
+    monkeypatch.setattr(Path, "glob", lambda *args: pytest.fail("Entries listed after startup"))  # noqa: ARG005
+    cache.store("c", response)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.json", "c.json"]